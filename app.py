@@ -1,28 +1,138 @@
+import os
+import time
+
+import click
 from apiflask import APIFlask
+from bson import ObjectId
+from flask.json.provider import DefaultJSONProvider
 from config import Config
 from endpoints import index, world
-from utils import worlds
+from utils import worlds, cache_stats
+from fragments import sidebar_html
+from world_routes import world_bp
+from entities import entity_bp
+import bundle
 import db
+import instrumentation
+import migration
+import views
 #@TODO: include Blueprints
 
 
 #region app setup
 
+class MongoJSONProvider(DefaultJSONProvider):
+    """Serializes the ObjectIds of Mongo documents as strings."""
+
+    @staticmethod
+    def default(o):
+        if isinstance(o, ObjectId):
+            return str(o)
+        return DefaultJSONProvider.default(o)
+
 # app = Flask(__name__)
 app = APIFlask(__name__, title='Worldgen API', version='1.0.0')
 app.config.from_object(Config)
+app.json = MongoJSONProvider(app)
+instrumentation.init_app(app)
 
 @app.context_processor
 def inject_sidebar():
-    """Injects the directory contents into the template context."""
+    """Injects the directory contents, and the sidebar rendered from them, into the template context."""
     sidebar_items = worlds()
-    return {"sidebar_items": sidebar_items}
+    return {"sidebar_items": sidebar_items, "sidebar_html": sidebar_html(sidebar_items)}
 
 app.jinja_env.add_extension('jinja2.ext.do')
+
+if app.config['ENSURE_INDEXES_ON_STARTUP']:
+    db.ensure_indexes()
+
+@app.cli.command('ensure-indexes')
+def ensure_indexes_command():
+    """Create missing indexes and report unused ones."""
+    for collection_name, report in db.ensure_indexes(report_unused=True).items():
+        click.echo(f"{collection_name}: created {report['created'] or 'none'}, unused {report['unused'] or 'none'}")
     
 #@TODO: Register Blueprints and URL Rules   
 app.add_url_rule('/', view_func=index, methods=['GET'])
 app.add_url_rule('/world/<string:world_name>', view_func=world, methods=['GET'])  
+app.register_blueprint(world_bp)
+app.register_blueprint(entity_bp)
+
+@app.get('/api/cache')
+def cache_status():
+    """Hit, miss and size counters of the world cache."""
+    return cache_stats()
+
+@app.cli.command('bundle-world')
+@click.argument('world_name')
+@click.option('--source', type=click.Choice(['files', 'mongo']), default='files', help='Where to read the world from.')
+def bundle_world_command(world_name, source):
+    """Pack a world into a single binary bundle."""
+    if source == 'mongo':
+        path = bundle.bundle_from_mongo(world_name)
+    else:
+        path = bundle.bundle_from_files(world_name)
+    click.echo(path)
+
+@app.cli.command('rebuild-views')
+@click.argument('world_name', required=False)
+def rebuild_views_command(world_name):
+    """Rebuild the materialized view of one world, or of every world."""
+    if world_name:
+        click.echo(f"{world_name}: {'rebuilt' if views.rebuild_view(world_name) is not None else 'not found'}")
+    else:
+        click.echo(f"Rebuilt {views.rebuild_views()} views")
+
+@app.cli.group('worldgen')
+def worldgen_cli():
+    """Move worlds between the JSON file layout and Mongo."""
+
+@worldgen_cli.command('import')
+@click.argument('world_names', nargs=-1)
+@click.option('--source', type=click.Path(exists=True, file_okay=False), help='Directory of the world directories, WORLDS_DIR by default.')
+@click.option('--batch-size', type=int, help='Records validated and written together.')
+@click.option('--workers', type=int, help='Validation processes, one per core by default.')
+@click.option('--skip-invalid', is_flag=True, help='Leave out the records that fail validation.')
+def import_command(world_names, source, batch_size, workers, skip_invalid):
+    """Import worlds from their JSON files into Mongo, every world of the directory by default."""
+    source = source or app.config['WORLDS_DIR']
+    world_names = world_names or sorted(name for name in os.listdir(source) if os.path.isdir(os.path.join(source, name)))
+    for world_name in world_names:
+        if not os.path.isdir(os.path.join(source, world_name)):
+            raise click.BadParameter(f"No directory {os.path.join(source, world_name)}", param_hint='WORLD_NAMES')
+    start = time.perf_counter()
+    report = migration.import_worlds([os.path.join(source, world_name) for world_name in world_names],
+                                     workers=workers, batch_size=batch_size, skip_invalid=skip_invalid)
+    for world_name, files in report.items():
+        for file_name, counts in files.items():
+            click.echo(f"{world_name}/{file_name}: wrote {counts['written']} of {counts['records']} records, {counts['invalid']} invalid, "
+                       f"{counts['unreferenced']} unreferenced")
+            for key, messages in counts['errors'].items():
+                click.echo(f"    {key}: {messages}", err=True)
+    click.echo(f"Imported {len(report)} worlds in {time.perf_counter() - start:.2f}s")
+
+@worldgen_cli.command('export')
+@click.argument('world_names', nargs=-1)
+@click.option('--out', type=click.Path(file_okay=False), help='Directory to write the world directories to, WORLDS_DIR by default.')
+@click.option('--workers', type=int, help='Files written at the same time, one per core by default.')
+def export_command(world_names, out, workers):
+    """Export worlds from Mongo to the JSON file layout, every world by default."""
+    world_names = world_names or worlds()
+    start = time.perf_counter()
+    report = migration.export_worlds(world_names, out or app.config['WORLDS_DIR'], workers=workers)
+    for world_name, files in report.items():
+        click.echo(f"{world_name}: " + ", ".join(f"{file_name} ({count})" for file_name, count in files.items()))
+    missing = set(world_names) - set(report)
+    if missing:
+        click.echo(f"Not found: {', '.join(sorted(missing))}", err=True)
+    click.echo(f"Exported {len(report)} worlds in {time.perf_counter() - start:.2f}s")
+
+@app.cli.command('unbundle-world')
+@click.argument('path')
+def unbundle_world_command(path):
+    """Unpack a bundle back into JSON category files."""
+    click.echo(bundle.unpack_bundle(path))
   
 #endregion App setup
 
@@ -0,0 +1 @@
+"""Benchmarks for the WorldGen API. Run them from the repository root, e.g. ``python -m benchmarks.bundle_load``."""
@@ -0,0 +1,101 @@
+"""
+Compare loading a world from its JSON category files against loading it from a bundle.
+
+    python -m benchmarks.bundle_load [--world Arinthia] [--repeat 200]
+
+Prints one JSON document with the mean load time of each layout and the growth of the
+resident set size (RSS) of a fresh process loading it once. Unlike allocation tracing, RSS
+counts the pages of a mapped bundle that are touched.
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import resource
+import sys
+import tempfile
+import time
+
+from bundle import WorldBundle, bundle_from_files
+from config import Config
+
+
+def load_json_layout(world_dir: str) -> dict:
+    world = {}
+    for file_name in os.listdir(world_dir):
+        if file_name.endswith('.json'):
+            with open(os.path.join(world_dir, file_name), 'r') as file:
+                world[file_name[:-len('.json')]] = json.load(file)
+    return world
+
+def load_bundle(path: str) -> dict:
+    with WorldBundle(path) as bundle:
+        return bundle.load_all()
+
+def load_bundle_category(path: str, category: str) -> object:
+    with WorldBundle(path) as bundle:
+        return bundle.load(category)
+
+def _peak_rss_bytes() -> int:
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == 'darwin' else peak * 1024
+
+def _rss_bytes() -> int:
+    """Current resident set size, or the peak one where /proc is not available."""
+    try:
+        with open('/proc/self/statm', 'r') as file:
+            return int(file.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except OSError:
+        return _peak_rss_bytes()
+
+def _rss_growth(fn, connection):
+    before, peak_before = _rss_bytes(), _peak_rss_bytes()
+    result = fn()
+    connection.send({"rss_growth_bytes": _rss_bytes() - before, "peak_rss_growth_bytes": _peak_rss_bytes() - peak_before})
+    del result
+
+def rss_growth(fn) -> dict:
+    """
+    How much the RSS of a fresh process grows while ``fn`` runs: at its peak, which includes
+    the mapped pages of a bundle read and closed, and afterwards with the result still held.
+    """
+    receiver, sender = multiprocessing.Pipe(duplex=False)
+    process = multiprocessing.get_context('fork').Process(target=_rss_growth, args=(fn, sender))
+    process.start()
+    growth = receiver.recv()
+    process.join()
+    return growth
+
+def measure(fn, repeat: int) -> dict:
+    fn()
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    elapsed = (time.perf_counter() - start) / repeat
+    return {"mean_seconds": elapsed, **rss_growth(fn)}
+
+def run(world_name: str, repeat: int) -> dict:
+    world_dir = os.path.join(Config.WORLDS_DIR, world_name)
+    with tempfile.TemporaryDirectory() as temp_dir:
+        path = bundle_from_files(world_name, os.path.join(temp_dir, f"{world_name}.wgb"))
+        category = sorted(load_json_layout(world_dir))[0]
+        return {
+            "world": world_name,
+            "repeat": repeat,
+            "json_size_bytes": sum(os.path.getsize(os.path.join(world_dir, name))
+                                   for name in os.listdir(world_dir) if name.endswith('.json')),
+            "bundle_size_bytes": os.path.getsize(path),
+            "json_layout": measure(lambda: load_json_layout(world_dir), repeat),
+            "bundle_all": measure(lambda: load_bundle(path), repeat),
+            f"bundle_{category}": measure(lambda: load_bundle_category(path, category), repeat),
+        }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--world', default='Arinthia')
+    parser.add_argument('--repeat', type=int, default=200)
+    args = parser.parse_args()
+    print(json.dumps(run(args.world, args.repeat), indent=Config.JSON_INDENT))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,217 @@
+"""
+Micro-benchmarks of the world read/write paths and an HTTP replay of a request trace.
+
+    python -m benchmarks.suite [--backend mongomock|mongod] [--uri URI] [--leaders 50] [--groups 20]
+                               [--relationships 400] [--eras 5] [--repeat 50] [--trace FILE] [--out FILE]
+
+A synthetic world (see `benchmarks.synthetic`) is loaded into Mongo and written to a temporary
+``Worlds/`` directory. The mongomock backend needs ``requirements-dev.txt``; the mongod backend
+uses a scratch database on the given server, dropped before and after the run.
+
+Traces have one JSON request per line: ``{"method": "GET", "path": "/api/world/{world}", "json": ...}``,
+where ``{world}`` is replaced by the synthetic world's name; see ``benchmarks/traces/``.
+
+Prints (or writes to --out) one JSON document, tagged with the current commit so runs of
+different commits can be compared.
+"""
+import argparse
+import json
+import os
+import subprocess
+import tempfile
+import time
+
+from config import Config
+import db
+
+from benchmarks.synthetic import generate_world, load_mongo, template_data, write_files
+
+BENCHMARK_DB = "WorldGenBenchmark"
+DEFAULT_TRACE = os.path.join(os.path.dirname(__file__), "traces", "sample.jsonl")
+
+
+def measure(fn, repeat: int, setup=None) -> dict:
+    """Mean and percentile timings of ``fn`` over ``repeat`` runs, ``setup`` running untimed before each."""
+    timings = []
+    for _ in range(repeat):
+        if setup is not None:
+            setup()
+        start = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - start)
+    return summarize(timings)
+
+def summarize(timings: list) -> dict:
+    timings = sorted(timings)
+    def percentile(fraction: float) -> float:
+        return timings[min(len(timings) - 1, int(fraction * len(timings)))]
+    return {
+        "runs": len(timings),
+        "mean_seconds": sum(timings) / len(timings),
+        "p50_seconds": percentile(0.50),
+        "p95_seconds": percentile(0.95),
+        "p99_seconds": percentile(0.99),
+    }
+
+def connect(backend: str, uri: str):
+    if backend == "mongomock":
+        import mongomock
+        client = mongomock.MongoClient()
+    else:
+        from pymongo import MongoClient
+        client = MongoClient(uri, **db.client_options())
+    client.drop_database(BENCHMARK_DB)
+    conf = db.conf
+    conf.DB_NAME = BENCHMARK_DB
+    db.use_client(client)
+    return client
+
+def commit() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "HEAD"], capture_output=True, text=True,
+                              cwd=os.path.dirname(__file__), check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+#region Benchmarks
+
+def bench_world_data(app, world_name: str, repeat: int) -> dict:
+    import utils
+    with app.test_request_context():
+        return {
+            "mongo_cold": measure(lambda: utils.world_data(world_name), repeat,
+                                  setup=lambda: utils.invalidate_world(world_name)),
+            "mongo_warm": measure(lambda: utils.world_data(world_name), repeat),
+            "files": measure(lambda: utils.world_data(world_name, from_file=True), repeat),
+        }
+
+def bench_update_world_reference(app, world_id, world: dict, repeat: int) -> dict:
+    import utils
+    leader = dict(world["Leaders"][0])
+    relationships = [dict(relationship) for relationship in world["Relationships"]]
+    def update_leader():
+        leader["traits"] = leader["traits"][1:] + leader["traits"][:1]
+        utils.update_world_reference(world_id, {"Leaders": [dict(leader)] + [{"_id": other["_id"]} for other in world["Leaders"][1:]]})
+    def update_relationships(bulk: bool):
+        for relationship in relationships:
+            relationship["reputation"] = -relationship["reputation"]
+        utils.update_world_reference(world_id, {"Relationships": [dict(relationship) for relationship in relationships]}, bulk=bulk)
+    with app.test_request_context():
+        return {
+            "one_leader": measure(update_leader, repeat),
+            "all_relationships": measure(lambda: update_relationships(False), max(1, repeat // 10)),
+            "all_relationships_bulk": measure(lambda: update_relationships(True), max(1, repeat // 10)),
+        }
+
+def bench_json(app, world_name: str, repeat: int) -> dict:
+    import utils
+    from store import world_store
+    with app.test_request_context():
+        path = os.path.join(utils.world_path(world_name), "relationships.json")
+        data = utils.load_json(path)
+        scratch = os.path.join(utils.world_path(world_name), "scratch.json")
+        result = {
+            "load_json_cold": measure(lambda: utils.load_json(path), repeat, setup=lambda: world_store.invalidate(path)),
+            "load_json_warm": measure(lambda: utils.load_json(path), repeat),
+            "dump_json": measure(lambda: utils.dump_json(scratch, data), repeat),
+            "bytes": os.path.getsize(path),
+        }
+        os.remove(scratch)
+        return result
+
+def bench_templates(app, world: dict, repeat: int) -> dict:
+    from flask import render_template
+    from markupsafe import Markup
+    data = template_data(world)
+    categories = [name for name in ("Geography", "leaders", "factions", "history", "pantheon")]
+    def render_page():
+        fragments = [(category, Markup(render_template(f"{category.lower()}.html", world_name=world["WorldName"], world_data=data)))
+                     for category in categories]
+        return render_template('world.html', world_name=world["WorldName"], fragments=fragments)
+    with app.test_request_context():
+        fragments = [(category, Markup(render_template(f"{category.lower()}.html", world_name=world["WorldName"], world_data=data)))
+                     for category in categories]
+        return {
+            "world_page": measure(render_page, repeat),
+            "assemble_cached_fragments": measure(
+                lambda: render_template('world.html', world_name=world["WorldName"], fragments=fragments), repeat),
+        }
+
+def replay(app, trace: str, world_name: str, repeat: int) -> dict:
+    """Send every request of a trace through the app ``repeat`` times."""
+    with open(trace, 'r') as file:
+        requests = [json.loads(line) for line in file if line.strip()]
+    client = app.test_client()
+    timings, statuses, by_path = [], {}, {}
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for entry in requests:
+            path = entry["path"].replace("{world}", world_name)
+            began = time.perf_counter()
+            response = client.open(path, method=entry.get("method", "GET"), json=entry.get("json"),
+                                   headers=entry.get("headers"))
+            response.get_data()
+            elapsed = time.perf_counter() - began
+            timings.append(elapsed)
+            statuses[response.status_code] = statuses.get(response.status_code, 0) + 1
+            by_path.setdefault(entry["path"], []).append(elapsed)
+    total = time.perf_counter() - start
+    return {
+        "trace": os.path.basename(trace),
+        "requests": len(timings),
+        "requests_per_second": len(timings) / total if total else None,
+        "statuses": {str(status): count for status, count in sorted(statuses.items())},
+        "latency": summarize(timings),
+        "by_path": {path: summarize(path_timings) for path, path_timings in by_path.items()},
+    }
+
+#endregion Benchmarks
+
+def run(args) -> dict:
+    client = connect(args.backend, args.uri)
+    world = generate_world("Bench", args.leaders, args.groups, args.relationships, args.eras, seed=args.seed)
+    world_id = load_mongo(world, db.get_db())
+    db.collections.refresh()
+    with tempfile.TemporaryDirectory() as worlds_dir:
+        write_files(world, worlds_dir)
+        # Imported once the benchmark client is in place: the app creates indexes on import
+        from app import app
+        app.config['WORLDS_DIR'] = worlds_dir
+        app.logger.disabled = True
+        try:
+            return {
+                "commit": commit(),
+                "backend": args.backend,
+                "world": {"leaders": args.leaders, "groups": args.groups, "relationships": args.relationships,
+                          "eras": args.eras, "seed": args.seed},
+                "repeat": args.repeat,
+                "world_data": bench_world_data(app, world["WorldName"], args.repeat),
+                "update_world_reference": bench_update_world_reference(app, world_id, world, args.repeat),
+                "json_files": bench_json(app, world["WorldName"], args.repeat),
+                "templates": bench_templates(app, world, args.repeat),
+                "replay": replay(app, args.trace, world["WorldName"], max(1, args.repeat // 10)),
+            }
+        finally:
+            client.drop_database(BENCHMARK_DB)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--backend', choices=['mongomock', 'mongod'], default='mongomock')
+    parser.add_argument('--uri', default=Config.MONGO_URI)
+    parser.add_argument('--leaders', type=int, default=50)
+    parser.add_argument('--groups', type=int, default=20)
+    parser.add_argument('--relationships', type=int, default=400)
+    parser.add_argument('--eras', type=int, default=5)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--repeat', type=int, default=50)
+    parser.add_argument('--trace', default=DEFAULT_TRACE)
+    parser.add_argument('--out')
+    args = parser.parse_args()
+    output = json.dumps(run(args), indent=Config.JSON_INDENT)
+    if args.out:
+        with open(args.out, 'w') as file:
+            file.write(output)
+    print(output)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,206 @@
+"""
+Synthetic worlds of configurable size for benchmarks.
+
+    python -m benchmarks.synthetic NAME [--leaders 50] [--groups 20] [--relationships 400] [--eras 5] [--out Worlds]
+
+Writes a generated world in the ``Worlds/`` file layout. Objects conform to the schemas in
+``schemas/`` and generation is deterministic for a given seed.
+"""
+import argparse
+import json
+import os
+import random
+
+from bson import ObjectId
+
+from config import Config
+from schemas.group_schema import Agenda_Types, Goal_Types, Group_Types
+
+WORDS = ("amber", "ash", "dawn", "dusk", "ember", "frost", "gold", "iron", "moon", "oak", "raven",
+         "salt", "shadow", "silver", "storm", "stone", "sun", "thorn", "tide", "wolf")
+LEVELS = ("Low", "Medium", "High")
+
+
+def _phrase(rng: random.Random, words: int) -> str:
+    return " ".join(rng.choice(WORDS) for _ in range(words))
+
+def _name(rng: random.Random, position: int) -> str:
+    return f"{rng.choice(WORDS).title()} {rng.choice(WORDS).title()} {position}"
+
+def generate_world(name: str, leaders: int=50, groups: int=20, relationships: int=400, eras: int=5,
+                   periods: int=8, gods: int=12, seed: int=0) -> dict:
+    """
+    Generate a world as a dict of categories, each a list of objects with an ``_id``.
+
+    Categories: Geography, Groups, Leaders, Relationships, Eras, Gods and Magic, named after the
+    collections they are stored in. Relationships run between random groups and leaders.
+    """
+    rng = random.Random(seed)
+
+    def object_id() -> ObjectId:
+        return ObjectId(bytes(rng.getrandbits(8) for _ in range(12)))
+
+    world = {"Geography": [{
+        "_id": object_id(),
+        "size": rng.choice(["Small", "Medium", "Large"]),
+        "balance": _phrase(rng, 4),
+        "landmarks": {_name(rng, position): _phrase(rng, 8) for position in range(10)},
+        "description": _phrase(rng, 20),
+    }]}
+    world["Groups"] = [{
+        "_id": object_id(),
+        "name": _name(rng, position),
+        "short_name": f"G{position}",
+        "type": Group_Types[position % len(Group_Types)],
+        "agenda": rng.choice(Agenda_Types),
+        "goal": rng.choice(Goal_Types),
+        "leadership": _name(rng, position),
+        "relationships": [],
+    } for position in range(groups)]
+    world["Leaders"] = [{
+        "_id": object_id(),
+        "name": _name(rng, position),
+        "short_name": f"L{position}",
+        "kingdom": rng.choice(world["Groups"])["name"] if world["Groups"] else "",
+        "faction": rng.choice(world["Groups"])["name"] if world["Groups"] else "",
+        "traits": [_phrase(rng, 2) for _ in range(4)],
+        "goals": [_phrase(rng, 6) for _ in range(3)],
+        "relationships": {},
+    } for position in range(leaders)]
+
+    entities = world["Groups"] + world["Leaders"]
+    world["Relationships"] = []
+    for position in range(relationships if len(entities) > 1 else 0):
+        source, target = rng.sample(entities, 2)
+        relationship = {
+            "_id": object_id(),
+            "name": f"{source['short_name']}-{target['short_name']}-{position}",
+            "from": source["name"],
+            "to": target["name"],
+            "reputation": rng.randint(-100, 100),
+            "intelligence": {
+                "level": rng.choice(LEVELS),
+                "schemes": [_phrase(rng, 5) for _ in range(2)],
+                "known_schemes": [_phrase(rng, 5) for _ in range(2)],
+            },
+        }
+        world["Relationships"].append(relationship)
+        if "relationships" in source and isinstance(source["relationships"], list):
+            source["relationships"].append(relationship["name"])
+        else:
+            source["relationships"][relationship["name"]] = {key: relationship[key] for key in ("reputation", "intelligence")}
+
+    year = 0
+    world["Eras"] = []
+    for era in range(eras):
+        era_periods = {}
+        for period in range(periods):
+            length = rng.randint(10, 500)
+            era_periods[f"Period {period}"] = {
+                "period": f"{year} - {year + length}",
+                "major_events": [_phrase(rng, 8) for _ in range(3)],
+                "minor_events": [_phrase(rng, 8) for _ in range(5)],
+                "perspective": {group["name"]: _phrase(rng, 12) for group in world["Groups"][:3]},
+            }
+            year += length
+        world["Eras"].append({"_id": object_id(), "name": f"Era {era}", "periods": era_periods})
+    world["Gods"] = [{"_id": object_id(), "name": _name(rng, position), "domain": _phrase(rng, 3)} for position in range(gods)]
+    world["Magic"] = [{
+        "_id": object_id(),
+        "uses": _phrase(rng, 5),
+        "sources": {_name(rng, position): {"type": rng.choice(WORDS), "description": _phrase(rng, 10),
+                                           "users": [_phrase(rng, 2)], "rules": [_phrase(rng, 6)],
+                                           "notes": _phrase(rng, 6), "examples": {_name(rng, 0): _phrase(rng, 6)}}
+                    for position in range(4)},
+    }]
+    world["WorldName"] = name
+    return world
+
+#region Loading
+
+# World document field -> the category (collection) its references point into
+WORLD_FIELDS = {
+    "Geography": "Geography",
+    "Leaders": "Leaders",
+    "Relationships": "Relationships",
+    "Eras": "Eras",
+    "Pantheon": "Gods",
+    "MagicSystems": "Magic",
+}
+
+def load_mongo(world: dict, database) -> ObjectId:
+    """Insert a generated world into a database, with its Worlds document referencing every object."""
+    document = {"WorldName": world["WorldName"]}
+    for category, objects in world.items():
+        if category != "WorldName" and objects:
+            database[category].insert_many([dict(obj) for obj in objects])
+    for field, category in WORLD_FIELDS.items():
+        ids = [obj["_id"] for obj in world[category]]
+        document[field] = ids[0] if field == "Geography" and ids else ids
+    document["Kingdoms"] = [group["_id"] for group in world["Groups"] if group["type"] == "Kingdom"]
+    document["Factions"] = [group["_id"] for group in world["Groups"] if group["type"] == "Faction"]
+    return database["Worlds"].insert_one(document).inserted_id
+
+def _plain(obj: object) -> object:
+    if isinstance(obj, ObjectId):
+        return str(obj)
+    if isinstance(obj, dict):
+        return {key: _plain(value) for key, value in obj.items()}
+    if isinstance(obj, list):
+        return [_plain(item) for item in obj]
+    return obj
+
+def file_layout(world: dict) -> dict:
+    """The category files of a generated world, by file name, in the ``Worlds/`` layout."""
+    return {
+        "geography.json": {"world_name": world["WorldName"], "geography": _plain(world["Geography"][0])},
+        "groups.json": _plain(world["Groups"]),
+        "leaders.json": _plain(world["Leaders"]),
+        "relationships.json": {relationship["name"]: _plain(relationship) for relationship in world["Relationships"]},
+        "history.json": {era["name"]: {"Periods": _plain(era["periods"])} for era in world["Eras"]},
+        "pantheon.json": _plain(world["Gods"]),
+        "magic.json": _plain(world["Magic"]),
+    }
+
+def write_files(world: dict, worlds_dir: str) -> str:
+    """Write a generated world in the ``Worlds/`` file layout and return its directory."""
+    world_dir = os.path.join(worlds_dir, world["WorldName"])
+    os.makedirs(world_dir, exist_ok=True)
+    for file_name, data in file_layout(world).items():
+        with open(os.path.join(world_dir, file_name), 'w') as file:
+            json.dump(data, file, indent=Config.JSON_INDENT)
+    return world_dir
+
+def template_data(world: dict) -> dict:
+    """A generated world shaped the way the category templates of ``world.html`` read it."""
+    relationships = {relationship["name"]: _plain(relationship) for relationship in world["Relationships"]}
+    return {
+        "Geography": _plain(world["Geography"][0]),
+        "leaders": {leader["name"]: {**_plain(leader), "relationships": list(leader["relationships"])}
+                    for leader in world["Leaders"]},
+        "factions": {group["name"]: _plain(group) for group in world["Groups"] if group["type"] == "Faction"},
+        "relationships": relationships,
+        "history": {era["name"]: {name: {"period": period["period"], "major events": period["major_events"],
+                                         "minor events": period["minor_events"]}
+                                  for name, period in era["periods"].items()}
+                    for era in world["Eras"]},
+        "pantheon": {god["name"]: _plain(god) for god in world["Gods"]},
+    }
+
+#endregion Loading
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('name')
+    parser.add_argument('--leaders', type=int, default=50)
+    parser.add_argument('--groups', type=int, default=20)
+    parser.add_argument('--relationships', type=int, default=400)
+    parser.add_argument('--eras', type=int, default=5)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--out', default=Config.WORLDS_DIR)
+    args = parser.parse_args()
+    world = generate_world(args.name, args.leaders, args.groups, args.relationships, args.eras, seed=args.seed)
+    print(write_files(world, args.out))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,75 @@
+"""
+Compare the validation paths for bulk payloads, in records validated per second.
+
+    python -m benchmarks.validation [--world Arinthia] [--records 10000] [--repeat 5]
+
+The records are copies of a world's relationships and gods, and of the world itself as one
+nested WorldSchema payload. Prints one JSON document with the throughput of each path.
+"""
+import argparse
+import json
+import os
+import time
+
+from config import Config
+import validation
+
+
+def records(world_name: str, file_name: str, count: int) -> list:
+    with open(os.path.join(Config.WORLDS_DIR, world_name, file_name), 'r') as file:
+        data = json.load(file)
+    if isinstance(data, dict):
+        data = list(data.values())
+    data = [{key: value for key, value in record.items() if key != '_id'} for record in data]
+    return [dict(data[position % len(data)]) for position in range(count)]
+
+def world_payload(world_name: str) -> dict:
+    world_dir = os.path.join(Config.WORLDS_DIR, world_name)
+    with open(os.path.join(world_dir, 'history.json'), 'r') as file:
+        history = json.load(file)
+    return {
+        "world_name": world_name,
+        "pantheon": {"gods": {god["name"]: god for god in records(world_name, 'pantheon.json', 20)}},
+        "history": {era: {"periods": {name: {key.replace(' ', '_'): value for key, value in period.items()}
+                                      for name, period in data["Periods"].items()}}
+                    for era, data in history.items()},
+    }
+
+def measure(fn, count: int, repeat: int) -> dict:
+    fn()
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    elapsed = (time.perf_counter() - start) / repeat
+    return {"mean_seconds": elapsed, "records_per_second": count / elapsed}
+
+def paths(schema_name: str, data: list, repeat: int) -> dict:
+    schema_class = Config.SCHEMA_CLASSES[schema_name]
+    return {
+        # What the entity endpoints did before schema instances were cached
+        "marshmallow_per_record": measure(
+            lambda: [schema_class(unknown='include').load(record) for record in data], len(data), repeat),
+        "marshmallow_cached": measure(lambda: validation.load(schema_name, data, many=True), len(data), repeat),
+        "pydantic": measure(lambda: validation.load(schema_name, data, many=True, fast=True), len(data), repeat),
+    }
+
+def run(world_name: str, count: int, repeat: int) -> dict:
+    return {
+        "world": world_name,
+        "records": count,
+        "repeat": repeat,
+        "RelationshipSchema": paths("RelationshipSchema", records(world_name, 'relationships.json', count), repeat),
+        "GodSchema": paths("GodSchema", records(world_name, 'pantheon.json', count), repeat),
+        "WorldSchema": paths("WorldSchema", [world_payload(world_name)] * max(1, count // 100), repeat),
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--world', default='Arinthia')
+    parser.add_argument('--records', type=int, default=10000)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+    print(json.dumps(run(args.world, args.records, args.repeat), indent=Config.JSON_INDENT))
+
+if __name__ == '__main__':
+    main()
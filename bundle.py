@@ -0,0 +1,178 @@
+import mmap
+import os
+import struct
+import threading
+from typing import Union
+
+import bson
+
+from config import Config
+from store import decode_json
+
+# Layout of a world bundle:
+#   MAGIC | header length (uint32, little endian) | header | category blobs
+# The header is a BSON document {"world": name, "categories": {name: [offset, length]}} with
+# offsets relative to the end of the header, and every category blob is the BSON document
+# {"data": <category data>}, so a single category can be decoded without touching the others.
+MAGIC = b"WGB1"
+_LENGTH = struct.Struct("<I")
+BUNDLE_EXTENSION = ".wgb"
+
+
+def bundle_path(world_name: str) -> str:
+    return os.path.join(Config.BUNDLES_DIR, f"{world_name}{BUNDLE_EXTENSION}")
+
+def write_bundle(file_path: str, world_name: str, categories: dict) -> str:
+    """
+    Pack the categories of a world into a single bundle file.
+
+    :param file_path: Where to write the bundle. It is replaced atomically.
+    :param world_name: Name of the world, stored in the header.
+    :param categories: Category name -> category data.
+    :return: The path of the bundle.
+    """
+    blobs = []
+    index = {}
+    offset = 0
+    for name, data in categories.items():
+        blob = bson.encode({"data": data})
+        index[name] = [offset, len(blob)]
+        blobs.append(blob)
+        offset += len(blob)
+    header = bson.encode({"world": world_name, "categories": index})
+
+    os.makedirs(os.path.dirname(os.path.abspath(file_path)), exist_ok=True)
+    temp_path = f"{file_path}.tmp"
+    with open(temp_path, 'wb') as file:
+        file.write(MAGIC)
+        file.write(_LENGTH.pack(len(header)))
+        file.write(header)
+        for blob in blobs:
+            file.write(blob)
+    os.replace(temp_path, file_path)
+    return file_path
+
+def bundle_from_files(world_name: str, file_path: Union[str, None]=None) -> str:
+    """Build a bundle from the JSON category files under ``Worlds/<world_name>/``."""
+    world_dir = os.path.join(Config.WORLDS_DIR, world_name)
+    categories = {}
+    for file_name in sorted(os.listdir(world_dir)):
+        if file_name.endswith('.json'):
+            with open(os.path.join(world_dir, file_name), 'rb') as file:
+                categories[file_name[:-len('.json')]] = decode_json(file.read())
+    return write_bundle(file_path or bundle_path(world_name), world_name, categories)
+
+def bundle_from_mongo(world_name: str, file_path: Union[str, None]=None) -> str:
+    """Build a bundle from the resolved world stored in Mongo."""
+    from utils import world_data
+
+    world = world_data(world_name)
+    categories = {name: data for name, data in world.items() if name not in ("_id", "WorldName")}
+    return write_bundle(file_path or bundle_path(world_name), world_name, categories)
+
+
+class WorldBundle:
+    """
+    Read-only view of a bundle file through ``mmap``.
+
+    Opening a bundle only decodes its header; each category is decoded from its own slice of
+    the mapping when it is asked for, so the pages of other categories are never read.
+    """
+
+    def __init__(self, file_path: str):
+        self.path = file_path
+        self._lock = threading.Lock()
+        with open(file_path, 'rb') as file:
+            self._map = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        if self._map[:len(MAGIC)] != MAGIC:
+            self._map.close()
+            raise ValueError(f"Not a world bundle: {file_path}")
+        header_start = len(MAGIC) + _LENGTH.size
+        (header_length,) = _LENGTH.unpack_from(self._map, len(MAGIC))
+        header = bson.decode(self._map[header_start:header_start + header_length])
+        self.world_name = header["world"]
+        self._index = header["categories"]
+        self._data_start = header_start + header_length
+
+    @property
+    def categories(self) -> list:
+        return list(self._index)
+
+    @property
+    def closed(self) -> bool:
+        return self._map.closed
+
+    def load(self, category: str) -> object:
+        if category not in self._index:
+            raise KeyError(category)
+        offset, length = self._index[category]
+        start = self._data_start + offset
+        with self._lock:
+            # Raises ValueError once the bundle is closed
+            blob = self._map[start:start + length]
+        return bson.decode(blob)["data"]
+
+    def load_all(self) -> dict:
+        return {category: self.load(category) for category in self._index}
+
+    def close(self):
+        with self._lock:
+            self._map.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+_open_bundles = {}
+_open_lock = threading.Lock()
+
+def open_bundle(file_path: str) -> WorldBundle:
+    """
+    Return an open bundle for a path, reusing the mapping while the file is unchanged.
+
+    Bundles are replaced atomically by `write_bundle`, so a changed mtime or size means a new
+    file. The mapping of the old file is closed; see `load_category` for reading safely
+    across a replacement.
+    """
+    path = os.path.abspath(file_path)
+    stat = os.stat(path)
+    stamp = (stat.st_mtime_ns, stat.st_size)
+    with _open_lock:
+        entry = _open_bundles.get(path)
+        if entry is not None and entry[0] == stamp:
+            return entry[1]
+        bundle = WorldBundle(path)
+        _open_bundles[path] = (stamp, bundle)
+    if entry is not None:
+        entry[1].close()
+    return bundle
+
+def load_category(file_path: str, category: str) -> object:
+    """
+    Load one category of the current bundle at a path.
+
+    :raises KeyError: If the bundle has no such category.
+    """
+    while True:
+        bundle = open_bundle(file_path)
+        try:
+            return bundle.load(category)
+        except ValueError:
+            # Closed by another thread that found the file replaced: read the new one
+            if not bundle.closed:
+                raise
+
+def unpack_bundle(file_path: str, world_dir: Union[str, None]=None) -> str:
+    """Write every category of a bundle back to the JSON layout under ``Worlds/<world>/``."""
+    from bson import json_util
+
+    with WorldBundle(file_path) as bundle:
+        world_dir = world_dir or os.path.join(Config.WORLDS_DIR, bundle.world_name)
+        os.makedirs(world_dir, exist_ok=True)
+        for category in bundle.categories:
+            with open(os.path.join(world_dir, f"{category}.json"), 'w') as file:
+                file.write(json_util.dumps(bundle.load(category), indent=Config.JSON_INDENT))
+    return world_dir
@@ -0,0 +1,197 @@
+import sys
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Hashable, Union
+
+from config import Config
+
+
+def approximate_size(obj: object) -> int:
+    """Approximate the memory footprint of a (possibly nested) object in bytes."""
+    seen = set()
+    stack = [obj]
+    size = 0
+    while stack:
+        item = stack.pop()
+        if id(item) in seen:
+            continue
+        seen.add(id(item))
+        size += sys.getsizeof(item)
+        if isinstance(item, dict):
+            stack.extend(item.keys())
+            stack.extend(item.values())
+        elif isinstance(item, (list, tuple, set, frozenset)):
+            stack.extend(item)
+    return size
+
+
+class LRUCache:
+    """
+    Thread-safe least recently used cache bounded by the approximate size of its values.
+
+    Entries are evicted oldest-first once the total size exceeds ``max_bytes``. An entry can
+    optionally expire after ``ttl`` seconds. Hit, miss and eviction counters are kept so the
+    cache can be sized from ``stats()``.
+    """
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()
+        self._lock = threading.RLock()
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key: Hashable, default: object=None) -> object:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return default
+            value, size, expires = entry
+            if expires is not None and expires < time.monotonic():
+                self._remove(key)
+                self.misses += 1
+                return default
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key: Hashable, value: object, ttl: Union[float, None]=None):
+        size = approximate_size(value)
+        if size > self.max_bytes:
+            return
+        expires = time.monotonic() + ttl if ttl is not None else None
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (value, size, expires)
+            self.size += size
+            while self.size > self.max_bytes:
+                oldest = next(iter(self._entries))
+                self._remove(oldest)
+                self.evictions += 1
+
+    def invalidate(self, predicate: Callable[[Hashable], bool]) -> int:
+        """Remove every entry whose key matches ``predicate``, returning how many were removed."""
+        with self._lock:
+            keys = [key for key in self._entries if predicate(key)]
+            for key in keys:
+                self._remove(key)
+            return len(keys)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.size = 0
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "size": self.size,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_ratio": self.hits / lookups if lookups else 0.0,
+            }
+
+    def _remove(self, key: Hashable):
+        _, size, _ = self._entries.pop(key)
+        self.size -= size
+
+
+class CachedValue:
+    """
+    A single cached value, loaded on first use and reloaded once it is older than ``ttl``
+    seconds or has been invalidated.
+    """
+
+    def __init__(self, loader: Callable[[], object], ttl: float):
+        self.loader = loader
+        self.ttl = ttl
+        self._value = None
+        self._expires = 0.0
+        self._lock = threading.Lock()
+
+    def get(self) -> object:
+        with self._lock:
+            if self._value is None or self._expires < time.monotonic():
+                self._value = self.loader()
+                self._expires = time.monotonic() + self.ttl
+            return self._value
+
+    def invalidate(self):
+        with self._lock:
+            self._value = None
+
+
+class _Flight:
+    def __init__(self):
+        self.done = threading.Event()
+        self.value = None
+        self.error = None
+
+class SingleFlight:
+    """
+    Coalesce concurrent computations of the same key in this process.
+
+    The first caller for a key runs the computation; callers arriving while it is in flight
+    wait for it and share its result (or exception) instead of repeating the work. With a
+    ``lease`` (a context manager factory called with the key, see `db.lease`) a computation
+    whose result is stored where every process reads it also takes a lock shared by every
+    process: after an invalidation one worker rebuilds the stored result while the others
+    wait, then find it instead of rebuilding it themselves.
+    """
+
+    def __init__(self, lease: Union[Callable, None]=None):
+        self.lease = lease
+        self._flights = {}
+        self._lock = threading.Lock()
+        self.loads = 0
+        self.coalesced = 0
+
+    def do(self, key: Hashable, compute: Callable[[], object], shared: bool=False) -> object:
+        """
+        :param shared: Whether ``compute`` reads a result it stores for every process when it
+            is missing, so it is worth waiting for the lease; a computation whose result only
+            lives in this process never takes it.
+        """
+        with self._lock:
+            flight = self._flights.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._flights[key] = _Flight()
+                self.loads += 1
+            else:
+                self.coalesced += 1
+        if not leader:
+            flight.done.wait()
+            if flight.error is not None:
+                raise flight.error
+            return flight.value
+        try:
+            if shared and self.lease is not None:
+                with self.lease(key):
+                    flight.value = compute()
+            else:
+                flight.value = compute()
+            return flight.value
+        except BaseException as err:
+            flight.error = err
+            raise
+        finally:
+            with self._lock:
+                del self._flights[key]
+            flight.done.set()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"loads": self.loads, "coalesced": self.coalesced, "in_flight": len(self._flights)}
+
+
+world_cache = LRUCache(Config.WORLD_CACHE_MAX_BYTES)
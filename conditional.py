@@ -0,0 +1,51 @@
+from datetime import datetime
+from functools import wraps
+from typing import Callable, Union
+
+from flask import current_app, request
+
+from utils import world_stamp
+
+
+def not_modified(tag: str, modified: Union[datetime, None]) -> bool:
+    """Whether the request's If-None-Match, or failing that If-Modified-Since, matches the world."""
+    if request.if_none_match:
+        return request.if_none_match.contains_weak(tag)
+    if request.if_modified_since and modified is not None:
+        return modified.replace(microsecond=0) <= request.if_modified_since
+    return False
+
+def conditional_world(cache_control: str, extra: Union[Callable, None]=None) -> Callable:
+    """
+    Make a view of a world answer conditional requests.
+
+    The ETag and Last-Modified of the response come from `utils.world_stamp`, which is checked
+    before the view runs: when the client's copy is current a 304 is returned without reading
+    the world at all. Views for missing worlds and error responses are passed through untouched.
+
+    :param cache_control: The Config key holding the Cache-Control header of the responses.
+    :param extra: Returns a string identifying anything else the view's output depends on,
+        added to the ETag.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(world_name, *args, **kwargs):
+            stamp = world_stamp(world_name, request.args.get('source') == 'file')
+            if stamp is None:
+                return view(world_name, *args, **kwargs)
+            tag, modified = stamp
+            if extra is not None:
+                tag = f"{tag}-{extra()}"
+            if not_modified(tag, modified):
+                response = current_app.response_class(status=304)
+            else:
+                response = current_app.make_response(view(world_name, *args, **kwargs))
+                if response.status_code != 200:
+                    return response
+            response.set_etag(tag)
+            if modified is not None:
+                response.last_modified = modified
+            response.headers['Cache-Control'] = current_app.config[cache_control]
+            return response
+        return wrapper
+    return decorator
@@ -10,14 +10,44 @@ import schemas
 class Config:
     SECRET_KEY = os.getenv('API_SECRET_KEY', 'your_default_secret_key')
     WORLDS_DIR = os.path.join(os.path.dirname(__file__), 'Worlds')
+    BUNDLES_DIR = os.path.join(os.path.dirname(__file__), 'Bundles')
+    USE_WORLD_BUNDLES = False
     SYNC_LOCAL_SPEC = True
     LOCAL_SPEC_PATH = os.path.join(os.path.dirname(__file__), 'openapi.json')
     JSON_INDENT = 4
     DEBUG = True
     SCHEMA_CLASSES = {c: getattr(schemas, c) for c in dir(schemas) if inspect.isclass(getattr(schemas,c)) and issubclass(getattr(schemas,c), Schema)}
     AUTH = HTTPTokenAuth(scheme='ApiKey', header='X-API-KEY')
-    MONGO_URI = "mongodb://172.20.1.3:27017/"
-    DB_NAME = "WorldGen"
+    MONGO_URI = os.getenv('MONGO_URI', "mongodb://172.20.1.3:27017/")
+    DB_NAME = os.getenv('MONGO_DB_NAME', "WorldGen")
+    MONGO_MAX_POOL_SIZE = int(os.getenv('MONGO_MAX_POOL_SIZE', 100))
+    MONGO_MIN_POOL_SIZE = int(os.getenv('MONGO_MIN_POOL_SIZE', 0))
+    MONGO_CONNECT_TIMEOUT_MS = int(os.getenv('MONGO_CONNECT_TIMEOUT_MS', 5000))
+    MONGO_SERVER_SELECTION_TIMEOUT_MS = int(os.getenv('MONGO_SERVER_SELECTION_TIMEOUT_MS', 5000))
+    MONGO_SOCKET_TIMEOUT_MS = int(os.getenv('MONGO_SOCKET_TIMEOUT_MS', 0)) or None
+    MONGO_COMPRESSORS = os.getenv('MONGO_COMPRESSORS', '')  # e.g. "zstd,snappy,zlib"
+    MONGO_COLLECTIONS_TTL = 5
+    MONGO_INSTRUMENTATION = os.getenv('MONGO_INSTRUMENTATION', '1') == '1'          # record every command, see instrumentation.py
+    MONGO_METRICS_REPLY_BYTES = os.getenv('MONGO_METRICS_REPLY_BYTES', '0') == '1'  # re-encode replies to measure their size
+    MONGO_QUERY_BUDGET = int(os.getenv('MONGO_QUERY_BUDGET', 0))                    # commands per request before a warning, 0 for none
+    HOSTILITY_THRESHOLD = 0    # reputation below which a relationship is hostile
+    ALLIANCE_THRESHOLD = 50    # reputation from which a relationship is an alliance
+    SEARCH_BACKEND = os.getenv('SEARCH_BACKEND', 'memory')  # "memory" or "mongo"
+    ENSURE_INDEXES_ON_STARTUP = os.getenv('ENSURE_INDEXES_ON_STARTUP', '0') == '1'  # otherwise run `flask ensure-indexes`
+    WORLD_CACHE_MAX_BYTES = int(os.getenv('WORLD_CACHE_MAX_BYTES', 64 * 1024 * 1024))
+    WORLD_LIST_CACHE_TTL = 30
+    USE_WORLD_VIEWS = os.getenv('USE_WORLD_VIEWS', '0') == '1'   # serve full world reads from the WorldViews collection
+    WORLD_LOAD_LEASE_SECONDS = float(os.getenv('WORLD_LOAD_LEASE_SECONDS', 0))  # > 0: one worker rebuilds a stale view, the others wait and read it
+    API_CACHE_CONTROL = os.getenv('API_CACHE_CONTROL', 'no-cache')    # clients and proxies revalidate with the ETag
+    PAGE_CACHE_CONTROL = os.getenv('PAGE_CACHE_CONTROL', 'no-cache')
+    STREAM_BATCH_SIZE = int(os.getenv('STREAM_BATCH_SIZE', 500))   # documents fetched per query when streaming
+    ENTITY_PAGE_SIZE = 100
+    ENTITY_MAX_PAGE_SIZE = 1000
+    FAST_BULK_VALIDATION = os.getenv('FAST_BULK_VALIDATION', '0') == '1'   # validate batches with the compiled pydantic models
+    STREAM_CHUNK_BYTES = 64 * 1024                                  # size of the chunks a streamed response is written in
+    IMPORT_BATCH_SIZE = int(os.getenv('IMPORT_BATCH_SIZE', 1000))   # records validated and written together by `flask worldgen import`
+    IMPORT_PENDING_BATCHES = 4                                      # batches of a world held in memory while they are validated
+    MIGRATION_WORKERS = int(os.getenv('MIGRATION_WORKERS', 0))      # import validation processes and export threads, 0 for one per core
 
 
     app.security_schemes = {
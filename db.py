@@ -1,14 +1,200 @@
+import os
+import threading
+import time
+from collections.abc import Mapping
+from contextlib import contextmanager
+from datetime import datetime, timedelta, timezone
+from typing import Union
+
+from bson import ObjectId
 from pymongo import MongoClient
+from pymongo.errors import DuplicateKeyError, OperationFailure
+from pymongo.collection import Collection
+from pymongo.database import Database
 from  config import Config
+from instrumentation import command_metrics
+from schemas import INDEXES, TEXT_INDEXES, VIEW_INDEXES
 
 conf = Config()
-client = MongoClient(conf.MONGO_URI)
-db = client[conf.DB_NAME]
 
 # For testing
-# client = MongoClient("mongodb://172.20.1.3:27017/")
-# db = client.WorldGen
+# MONGO_URI = "mongodb://172.20.1.3:27017/"
+# DB_NAME = "WorldGen"
+
+_client = None
+_client_pid = None
+_client_lock = threading.Lock()
+
+def client_options() -> dict:
+    """Connection pool, timeout, compression and monitoring settings for the MongoClient, read from Config."""
+    options = {
+        "maxPoolSize": conf.MONGO_MAX_POOL_SIZE,
+        "minPoolSize": conf.MONGO_MIN_POOL_SIZE,
+        "connectTimeoutMS": conf.MONGO_CONNECT_TIMEOUT_MS,
+        "serverSelectionTimeoutMS": conf.MONGO_SERVER_SELECTION_TIMEOUT_MS,
+        "socketTimeoutMS": conf.MONGO_SOCKET_TIMEOUT_MS,
+    }
+    if conf.MONGO_COMPRESSORS:
+        options["compressors"] = conf.MONGO_COMPRESSORS
+    if conf.MONGO_INSTRUMENTATION:
+        options["event_listeners"] = [command_metrics]
+    return options
+
+def get_client() -> MongoClient:
+    """
+    Return this process's MongoClient, creating it on first use.
+
+    The client is created with ``connect=False`` so nothing touches the network until the
+    first command, and it is recreated when the process id changes, so every worker of a
+    pre-fork server gets its own pool instead of one inherited from the parent.
+    """
+    global _client, _client_pid
+    pid = os.getpid()
+    if _client is None or _client_pid != pid:
+        with _client_lock:
+            if _client is None or _client_pid != pid:
+                _client = MongoClient(conf.MONGO_URI, connect=False, **client_options())
+                _client_pid = pid
+    return _client
+
+def use_client(client: MongoClient):
+    """
+    Serve this process's queries from the given client instead of one built from Config,
+    e.g. a mongomock stand-in for benchmarks. Takes effect for every later `get_client` call.
+    """
+    global _client, _client_pid
+    with _client_lock:
+        _client = client
+        _client_pid = os.getpid()
+    collections.refresh()
+
+def get_db() -> Database:
+    return get_client()[conf.DB_NAME]
+
+class Collections(Mapping):
+    """
+    The collections of the database, resolved on demand.
+
+    Indexing returns a handle to any collection without a round trip, creating it on first
+    write like ``Database.__getitem__``. Membership and iteration reflect the collections
+    that exist, re-read from the server at most every MONGO_COLLECTIONS_TTL seconds, so
+    collections created elsewhere show up without a restart.
+    """
+
+    def __init__(self):
+        self._names = None
+        self._expires = 0.0
+
+    def names(self) -> list:
+        if self._names is None or self._expires < time.monotonic():
+            self._names = [name for name in get_db().list_collection_names() if name not in ['system.indexes', 'system.users']]
+            self._expires = time.monotonic() + conf.MONGO_COLLECTIONS_TTL
+        return self._names
+
+    def refresh(self):
+        self._names = None
+
+    def __getitem__(self, name: str) -> Collection:
+        return get_db()[name]
+
+    def __contains__(self, name: object) -> bool:
+        return name in self.names()
+
+    def __iter__(self):
+        return iter(self.names())
+
+    def __len__(self) -> int:
+        return len(self.names())
+
+collections = Collections()
+
+def __getattr__(name: str):
+    # `db.client` and `db.db` are kept for callers of the old module-level globals
+    if name == "client":
+        return get_client()
+    if name == "db":
+        return get_db()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+def _key_spec(keys) -> tuple:
+    """
+    What identifies an index: its keys and directions. A collection has at most one text index,
+    stored under internal keys, so every text index has the same spec.
+    """
+    keys = tuple((field, direction) for field, direction in keys)
+    if any(direction == "text" for _, direction in keys):
+        return ("text",)
+    return keys
+
+def ensure_indexes(registry: Union[dict, None]=None, report_unused: bool=False) -> dict:
+    """
+    Create the indexes declared in the registry that do not exist yet.
+
+    Safe to run repeatedly: an index is only created when no index on the same keys exists,
+    whatever its name.
+
+    :param registry: Index models by collection name, see `schemas.indexes`. Defaults to INDEXES,
+        plus TEXT_INDEXES when SEARCH_BACKEND is "mongo" and VIEW_INDEXES when USE_WORLD_VIEWS is set.
+    :param report_unused: Also list the indexes that have not been used since the server started.
+    :return: Per collection, the names of the indexes that were missing and created, and of
+        the unused indexes when requested.
+    """
+    if registry is None:
+        registry = {name: list(models) for name, models in INDEXES.items()}
+        if conf.SEARCH_BACKEND == "mongo":
+            for name, models in TEXT_INDEXES.items():
+                registry.setdefault(name, []).extend(models)
+        if conf.USE_WORLD_VIEWS:
+            for name, models in VIEW_INDEXES.items():
+                registry.setdefault(name, []).extend(models)
+    report = {}
+    for collection_name, models in registry.items():
+        collection = get_db()[collection_name]
+        existing = {_key_spec(info["key"]) for info in collection.index_information().values()}
+        missing = [model for model in models if _key_spec(model.document["key"].items()) not in existing]
+        if missing:
+            collection.create_indexes(missing)
+        report[collection_name] = {"created": [model.document["name"] for model in missing]}
+        if report_unused:
+            report[collection_name]["unused"] = unused_indexes(collection)
+    return report
+
+def unused_indexes(collection: Collection) -> list:
+    """Names of the indexes of a collection with no recorded accesses, per ``$indexStats``."""
+    try:
+        stats = collection.aggregate([{"$indexStats": {}}])
+        return [index["name"] for index in stats if index["name"] != "_id_" and index["accesses"]["ops"] == 0]
+    except OperationFailure:
+        return []
+
+@contextmanager
+def lease(name: str, ttl: float, poll: float=0.05):
+    """
+    Hold a short-lived lock shared by every process using the database.
 
-collections = {name: db[name] for name in db.list_collection_names() if name not in ['system.indexes', 'system.users']}
+    The lease is a document in the Leases collection that expires after ``ttl`` seconds, so a
+    crashed holder cannot block others for longer. While another process holds it, this waits
+    for its release; if it is still held after ``ttl`` seconds the body runs anyway.
 
-    
\ No newline at end of file
+    :return: Whether the lease was acquired, as the value of the ``with`` statement.
+    """
+    leases = get_db()["Leases"]
+    owner = ObjectId()
+    deadline = time.monotonic() + ttl
+    acquired = False
+    while True:
+        now = datetime.now(timezone.utc)
+        try:
+            leases.update_one({"_id": name, "expires": {"$lt": now}},
+                              {"$set": {"owner": owner, "expires": now + timedelta(seconds=ttl)}}, upsert=True)
+            acquired = True
+            break
+        except DuplicateKeyError:
+            if time.monotonic() >= deadline:
+                break
+            time.sleep(poll)
+    try:
+        yield acquired
+    finally:
+        if acquired:
+            leases.delete_one({"_id": name, "owner": owner})
@@ -0,0 +1,61 @@
+import threading
+from typing import Callable, Union
+
+from bson import ObjectId
+
+import utils
+
+
+class WorldIndex:
+    """
+    Structures derived from the data of each world, such as relationship graphs.
+
+    A structure is built with ``build(world_name, from_file)`` on first use and kept while the
+    world's version is unchanged. Objects written to ``collection_name`` (or to any collection
+    when it is None) through `utils.update_world_reference` are applied to the cached
+    structures with ``apply(structure, collection_name, objects)`` instead of forcing a
+    rebuild, when the structure is valid for the version just before the one the write
+    produced (or for that version already, for the other collections of the same write); if
+    another worker wrote to the world in between, the structure is rebuilt. A write that
+    drops objects from the world's references is not applied either: ``apply`` only adds and
+    replaces, so the structure is rebuilt on next use.
+    """
+
+    def __init__(self, build: Callable, collection_name: Union[str, None]=None, apply: Union[Callable, None]=None):
+        self.build = build
+        self.collection_name = collection_name
+        self.apply = apply
+        # (world name, from_file) -> (version the structure is valid for, structure)
+        self._entries = {}
+        self._lock = threading.Lock()
+        if apply is not None:
+            utils.write_listeners.append(self._on_write)
+
+    def get(self, world_name: str, from_file: bool=False) -> object:
+        """The structure for a world, or None if the world does not exist."""
+        version = utils.world_version(world_name, from_file)
+        if version is None:
+            return None
+        key = (world_name, from_file)
+        entry = self._entries.get(key)
+        if entry is not None and entry[0] == version:
+            return entry[1]
+        structure = self.build(world_name, from_file)
+        with self._lock:
+            self._entries[key] = (version, structure)
+        return structure
+
+    def _on_write(self, world_id: ObjectId, collection_name: str, objects: list, removed: list,
+                  world_version: Union[int, None]):
+        if self.collection_name is not None and collection_name != self.collection_name:
+            return
+        for (world_name, from_file), (version, structure) in list(self._entries.items()):
+            if from_file or utils.world_object_id(world_name) != world_id:
+                continue
+            if removed or world_version is None or version not in (world_version - 1, world_version):
+                with self._lock:
+                    self._entries.pop((world_name, from_file), None)
+                continue
+            self.apply(structure, collection_name, objects)
+            with self._lock:
+                self._entries[(world_name, from_file)] = (world_version, structure)
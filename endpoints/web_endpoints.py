@@ -1,9 +1,12 @@
 #region Web Routes
 
 import os
-from flask import render_template, current_app
+import zlib
+from flask import abort, render_template, current_app
 
-from utils import world_data
+from conditional import conditional_world
+from fragments import world_fragments
+from utils import worlds
 
 
 def index():
@@ -11,12 +14,15 @@ def index():
     return render_template('index.html', world_names=world_names)
 
 
+def sidebar_tag():
+    """The rendered page includes the world list of the sidebar, so its ETag depends on it."""
+    return format(zlib.crc32("\n".join(worlds()).encode()), 'x')
+
+@conditional_world('PAGE_CACHE_CONTROL', extra=sidebar_tag)
 def world(world_name):
-    data = world_data(world_name)
-    data.pop("_id")
-    data["world_name"] = world_name
-    data.pop("WorldName")
-    
-    return render_template('world.html', world_name=world_name, world_data=data)
+    fragments = world_fragments(world_name)
+    if fragments is None:
+        abort(404)
+    return render_template('world.html', world_name=world_name, fragments=fragments)
 
 #endregion Web Routes
\ No newline at end of file
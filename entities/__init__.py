@@ -0,0 +1 @@
+from .entity_blueprint import entity_bp         # noqa: F401
@@ -1,36 +1,147 @@
-from flask import Blueprint, current_app, request
-from apiflask import Schema, input, output, abort
+from apiflask import APIBlueprint, abort
+from bson import ObjectId
+from flask import jsonify, request
 from marshmallow import ValidationError
+from pymongo.errors import BulkWriteError, DuplicateKeyError
 
+from config import Config
+import db
+import utils
+import validation
 
-entity_bp = Blueprint('entity', __name__)
 
-SCHEMA_CLASSES = current_app.config['SCHEMA_CLASSES']
+entity_bp = APIBlueprint('entity', __name__, url_prefix='/api/entities')
 
+# Entity type (the collection it is stored in) -> name of its schema in SCHEMA_CLASSES
+ENTITY_TYPES = {
+    "Eras":          "EraSchema",
+    "Gods":          "GodSchema",
+    "Groups":        "GroupSchema",
+    "Leaders":       "LeaderSchema",
+    "Magic":         "MagicSchema",
+    "Relationships": "RelationshipSchema",
+    "Worlds":        "WorldSchema",
+}
 
-def get_schema(entity_type):
-    schema_class = SCHEMA_CLASSES.get(entity_type)
-    if not schema_class:
+
+def world_entity_name(entity):
+    """Pop the validated world_name of a world entity; worlds are stored under WorldName."""
+    world_name = entity.pop('world_name', None)
+    if not world_name:
+        abort(400, message="world_name is required")
+    return world_name
+
+
+def get_schema_name(entity_type):
+    schema_name = ENTITY_TYPES.get(entity_type)
+    if schema_name not in Config.SCHEMA_CLASSES:
         abort(400, message=f"No schema defined for entity type: {entity_type}")
-    return schema_class()
+    return schema_name
+
+def get_collection(entity_type):
+    get_schema_name(entity_type)
+    return db.collections[entity_type]
+
+def load_entities(entity_type, data, many=False):
+    """
+    Validate entities against their schema, keeping their _id as an ObjectId.
+
+    Stored entities carry fields their schema does not declare (name, from, to...), those are
+    kept. Batches use the compiled validator when FAST_BULK_VALIDATION is set.
+    """
+    entities = data if many else [data]
+    if not isinstance(entities, list) or not all(isinstance(entity, dict) for entity in entities):
+        abort(400, message="Expected a JSON object or an array of objects")
+    ids = [entity.get('_id') for entity in entities]
+    try:
+        loaded = validation.load(get_schema_name(entity_type),
+                                 [{key: value for key, value in entity.items() if key != '_id'} for entity in entities],
+                                 many=True, fast=many and Config.FAST_BULK_VALIDATION)
+    except ValidationError as err:
+        abort(400, message="Validation failed", detail=err.messages)
+    for entity, obj_id in zip(loaded, ids):
+        if obj_id is not None:
+            if not ObjectId.is_valid(obj_id):
+                abort(400, message=f"Invalid _id: {obj_id}")
+            entity['_id'] = ObjectId(obj_id)
+    return loaded if many else loaded[0]
 
 @entity_bp.route('/<entity_type>', methods=['GET'])
-@output(Schema(many=True))  # Replace Schema with a more generic response schema if needed
 def get_entities(entity_type):
-    schema = get_schema(entity_type)
-    # Load entities from database or file (this is a placeholder)
-    entities = []
-    return entities
+    """
+    One page of entities in _id order.
+
+    Pages are keyset based: pass the ``next`` cursor of a page as ``?after=`` to get the following
+    one. Each page is an indexed range scan on _id, so it costs the same however deep it is.
+    """
+    collection = get_collection(entity_type)
+    try:
+        limit = int(request.args.get('limit', Config.ENTITY_PAGE_SIZE))
+    except ValueError:
+        abort(400, message="limit must be an integer")
+    if not 0 < limit <= Config.ENTITY_MAX_PAGE_SIZE:
+        abort(400, message=f"limit must be between 1 and {Config.ENTITY_MAX_PAGE_SIZE}")
+    query = {}
+    after = request.args.get('after')
+    if after is not None:
+        if not ObjectId.is_valid(after):
+            abort(400, message=f"Invalid cursor: {after}")
+        query['_id'] = {'$gt': ObjectId(after)}
+    # One extra document tells whether there is a next page
+    entities = list(collection.find(query).sort('_id', 1).limit(limit + 1))
+    has_next = len(entities) > limit
+    entities = entities[:limit]
+    return jsonify({
+        "items": entities,
+        "next": str(entities[-1]['_id']) if has_next else None,
+    })
 
 @entity_bp.route('/<entity_type>', methods=['POST'])
-@input(Schema)  # Replace Schema with a more generic input schema if needed
-@output(Schema)  # Replace Schema with a more generic response schema if needed
 def create_entity(entity_type):
-    schema = get_schema(entity_type)
+    """
+    Validate and insert an entity, or an array of entities in a single unordered batch.
+
+    A batch is validated as a whole before anything is written; if some inserts fail (e.g. a
+    duplicate _id) the others are still written and the failures are reported.
+    """
+    collection = get_collection(entity_type)
+    data = request.get_json()
+    if not isinstance(data, list):
+        entity = load_entities(entity_type, data)
+        if entity_type == "Worlds":
+            # Through create_world, so the world id map and name list see it straight away
+            world_name = world_entity_name(entity)
+            try:
+                entity['_id'] = utils.create_world(world_name, entity)
+            except DuplicateKeyError:
+                abort(409, message=f"World {world_name} already exists")
+            entity['WorldName'] = world_name
+            return jsonify(entity), 201
+        try:
+            entity['_id'] = collection.insert_one(entity).inserted_id
+        except DuplicateKeyError as err:
+            abort(409, message="The entity could not be inserted", detail={
+                "inserted": [],
+                "errors": [{"index": 0, "message": err.details.get('errmsg', str(err)) if err.details else str(err)}],
+            })
+        return jsonify(entity), 201
+    if not data:
+        abort(400, message="Empty batch")
+    entities = load_entities(entity_type, data, many=True)
+    if entity_type == "Worlds":
+        entities = [utils.world_document(world_entity_name(entity), entity) for entity in entities]
     try:
-        data = schema.load(request.json)
-    except ValidationError as err:
-        abort(400, message=err.messages)
-    
-    # Save the new entity (this is a placeholder)
-    return data, 201
+        result = collection.insert_many(entities, ordered=False)
+    except BulkWriteError as err:
+        if entity_type == "Worlds":
+            utils.refresh_world_ids()
+            utils.world_names.invalidate()
+        failed = {error['index'] for error in err.details['writeErrors']}
+        abort(409, message="Some entities could not be inserted", detail={
+            "inserted": [str(entity['_id']) for position, entity in enumerate(entities) if position not in failed],
+            "errors": [{"index": error['index'], "message": error['errmsg']} for error in err.details['writeErrors']],
+        })
+    if entity_type == "Worlds":
+        utils.refresh_world_ids()
+        utils.world_names.invalidate()
+    return jsonify({"inserted": [str(obj_id) for obj_id in result.inserted_ids]}), 201
@@ -0,0 +1,133 @@
+from typing import Union
+
+from apiflask.fields import Dict, List, Nested
+
+import validation
+
+# WorldSchema field -> (the world document fields holding it, the WorldSchema level whose
+# entries are stored as separate objects in the referenced collection, if any)
+WORLD_SCHEMA_FIELDS = {
+    "world_name": (["WorldName"], None),
+    "geography":  (["Geography"], None),
+    "pantheon":   (["Pantheon"], "gods"),
+    "magic":      (["MagicSystems"], "sources"),
+    "groups":     (["Kingdoms", "Factions"], None),
+    "leaders":    (["Leaders"], None),
+    "history":    (["Eras"], None),
+}
+
+
+def _nested_schema(field) -> object:
+    """The schema held by a Nested field, or by the values of a Dict or List field."""
+    if isinstance(field, Dict):
+        field = field.value_field
+    elif isinstance(field, List):
+        field = field.inner
+    if isinstance(field, Nested):
+        return field.schema
+    return None
+
+def parse_fields(spec: Union[str, None]) -> Union[dict, None]:
+    """
+    Parse a sparse fieldset such as ``geography,pantheon.gods.name``, validated against WorldSchema.
+
+    :param spec: Comma separated dotted paths.
+    :return: WorldSchema field -> set of dotted paths below it, an empty set meaning the whole
+        field, or None if no fields were asked for.
+    :raises ValueError: If a path does not name a field of WorldSchema.
+    """
+    if not spec or not spec.strip():
+        return None
+    fields = {}
+    for path in spec.split(','):
+        path = path.strip()
+        if not path:
+            continue
+        top, *segments = path.split('.')
+        field = validation.schema("WorldSchema").fields.get(top)
+        if field is None or top not in WORLD_SCHEMA_FIELDS:
+            raise ValueError(f"Unknown field: {path}")
+        for segment in segments:
+            schema = _nested_schema(field)
+            if schema is None or segment not in schema.fields:
+                raise ValueError(f"Unknown field: {path}")
+            field = schema.fields[segment]
+        if not segments:
+            fields[top] = None
+        elif fields.get(top, set()) is not None:
+            fields.setdefault(top, set()).add('.'.join(segments))
+    return {top: (paths or set()) for top, paths in fields.items()}
+
+def parse_include(spec: Union[str, None]) -> Union[set, None]:
+    """
+    Parse the comma separated WorldSchema fields whose references should be resolved.
+
+    :return: The world document fields to resolve, or None to resolve every reference.
+    :raises ValueError: If a name is not a field of WorldSchema.
+    """
+    if not spec or not spec.strip():
+        return None
+    include = set()
+    for name in spec.split(','):
+        name = name.strip()
+        if name not in WORLD_SCHEMA_FIELDS:
+            raise ValueError(f"Unknown field: {name}")
+        include.update(WORLD_SCHEMA_FIELDS[name][0])
+    return include
+
+def document_fields(fields: dict) -> list:
+    """The world document fields holding the given WorldSchema fields."""
+    return [document_field for top in fields for document_field in WORLD_SCHEMA_FIELDS[top][0]]
+
+def object_projection(top: str, paths: set) -> Union[dict, None]:
+    """
+    Mongo projection on the objects referenced by a WorldSchema field, None for whole objects.
+
+    Each referenced object is one entry of the field, so the level naming the entries (e.g.
+    ``gods`` in ``pantheon.gods.name``) is dropped from the path.
+    """
+    container = WORLD_SCHEMA_FIELDS[top][1]
+    projection = {}
+    for path in paths:
+        segments = path.split('.')
+        if container is not None and segments[0] == container:
+            segments = segments[1:]
+        if not segments:
+            return None
+        projection['.'.join(segments)] = 1
+    return projection or None
+
+def project_object(obj: object, projection: dict) -> object:
+    """Apply an inclusion projection with dotted paths to an object, like Mongo does."""
+    if isinstance(obj, list):
+        return [project_object(item, projection) for item in obj]
+    if not isinstance(obj, dict):
+        return obj
+    nested = {}
+    projected = {"_id": obj["_id"]} if "_id" in obj else {}
+    for path in projection:
+        head, _, rest = path.partition('.')
+        if head not in obj:
+            continue
+        if rest:
+            nested.setdefault(head, {})[rest] = 1
+        else:
+            projected[head] = obj[head]
+    for head, sub_projection in nested.items():
+        if head not in projected:
+            projected[head] = project_object(obj[head], sub_projection)
+    return projected
+
+def select_paths(top: str, data: object, paths: set) -> object:
+    """
+    Keep only the given dotted paths of one category of a file-backed world.
+
+    Categories hold either a list of objects, a dict of named objects or a single object; the
+    projection of `object_projection` is applied to each object.
+    """
+    projection = object_projection(top, paths)
+    if projection is None:
+        return data
+    if isinstance(data, dict) and data and all(isinstance(value, dict) for value in data.values()):
+        return {name: project_object(value, projection) for name, value in data.items()}
+    return project_object(data, projection)
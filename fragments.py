@@ -0,0 +1,67 @@
+from flask import current_app, render_template
+from jinja2 import TemplateNotFound
+from markupsafe import Markup
+
+import db
+from cache import world_cache
+from utils import BOOKKEEPING_FIELDS, category_versions, resolve_references
+
+# Category template -> the other categories of world_data it reads
+FRAGMENT_DEPENDENCIES = {
+    "factions.html": ["relationships"],
+    "kingdoms.html": ["relationships"],
+    "leaders.html":  ["relationships"],
+}
+
+# Categories shown only through the templates of other categories
+HIDDEN_CATEGORIES = {"relationships"}
+
+
+def fragment_template(field: str):
+    """The template rendering a category of a world, or None if there is none."""
+    name = f"{field.lower()}.html"
+    try:
+        return current_app.jinja_env.get_template(name)
+    except TemplateNotFound:
+        return None
+
+def world_fragments(world_name: str) -> list:
+    """
+    The rendered HTML of every category of a world, as (category, fragment) pairs.
+
+    Fragments are cached by the versions of the categories they show (see
+    `utils.category_versions`), so after a write only the templates reading the written
+    categories are rendered again, from just the data they need.
+
+    :return: None if the world does not exist.
+    """
+    world = db.collections["Worlds"].find_one({"WorldName": world_name})
+    if world is None:
+        return None
+    fields = [field for field in world if field not in ("_id", "WorldName", *BOOKKEEPING_FIELDS)]
+    fragments = []
+    for field in fields:
+        if field.lower() in HIDDEN_CATEGORIES:
+            continue
+        template = fragment_template(field)
+        if template is None:
+            continue
+        dependencies = FRAGMENT_DEPENDENCIES.get(template.name, [])
+        needed = [field] + [other for other in fields if other != field and other.lower() in dependencies]
+        key = ("fragment", world_name, field, category_versions(world, needed))
+        fragment = world_cache.get(key)
+        if fragment is None:
+            data = resolve_references({name: world[name] for name in needed})
+            fragment = Markup(render_template(template, world_name=world_name, world_data=data))
+            world_cache.set(key, fragment)
+        fragments.append((field, fragment))
+    return fragments
+
+def sidebar_html(sidebar_items: list) -> Markup:
+    """The rendered sidebar, cached for each list of worlds."""
+    key = ("sidebar", tuple(sidebar_items))
+    html = world_cache.get(key)
+    if html is None:
+        html = Markup(current_app.jinja_env.get_template('sidebar.html').render(sidebar_items=sidebar_items))
+        world_cache.set(key, html)
+    return html
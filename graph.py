@@ -0,0 +1,197 @@
+import threading
+from array import array
+from collections import deque
+from typing import Union
+
+import utils
+from derived import WorldIndex
+
+# Rebuild the CSR arrays once this many relationship writes are pending in the overlay
+COMPACT_THRESHOLD = 256
+
+
+def relationship_key(relationship: dict) -> str:
+    """
+    Identity of a relationship: its _id, which every written relationship carries, or its short
+    name (e.g. ``SH-IF``) for a relationship of a world file that has none.
+    """
+    obj_id = relationship.get("_id")
+    if isinstance(obj_id, dict) and "$oid" in obj_id:
+        obj_id = obj_id["$oid"]
+    return str(obj_id or relationship.get("name"))
+
+def world_relationships(world_name: str, from_file: bool=False) -> list:
+    """Every relationship of a world as a list of dicts with ``from``, ``to`` and ``name``."""
+    category = "relationships" if from_file else "Relationships"
+    data = utils.category_objects(world_name, category, from_file) or []
+    if isinstance(data, dict):
+        data = [{**relationship, "name": relationship.get("name", name)} for name, relationship in data.items()]
+    return [relationship for relationship in data if isinstance(relationship, dict)]
+
+
+class RelationshipGraph:
+    """
+    Adjacency index over the relationships of a world.
+
+    Entities (the ``from``/``to`` of each relationship) are numbered and the edges are kept in
+    CSR form: ``_out_targets[_out_offsets[n]:_out_offsets[n + 1]]`` are the entities ``n`` has a
+    relationship with, and ``_out_edges`` the matching relationship indices; ``_in_*`` hold
+    the same for incoming edges. Writes go to a small overlay that queries consult alongside
+    the CSR arrays, which are rebuilt once the overlay grows past COMPACT_THRESHOLD.
+    """
+
+    def __init__(self, relationships: list):
+        self._lock = threading.RLock()
+        self._build({relationship_key(relationship): relationship for relationship in relationships})
+
+    def _build(self, relationships: dict):
+        self._entities = {}
+        self.names = []
+        self._relationships = []
+        self._keys = {}
+        edges = []
+        for key, relationship in relationships.items():
+            source, target = relationship.get("from"), relationship.get("to")
+            if not source or not target:
+                continue
+            self._keys[key] = len(self._relationships)
+            self._relationships.append(relationship)
+            edges.append((self._entity(source), self._entity(target)))
+        self._out_offsets, self._out_targets, self._out_edges = self._csr(edges, 0, 1)
+        self._in_offsets, self._in_targets, self._in_edges = self._csr(edges, 1, 0)
+        self._pending = {}
+
+    def _entity(self, name: str) -> int:
+        index = self._entities.get(name)
+        if index is None:
+            index = self._entities[name] = len(self.names)
+            self.names.append(name)
+        return index
+
+    def _csr(self, edges: list, row: int, column: int) -> tuple:
+        counts = [0] * (len(self.names) + 1)
+        for edge in edges:
+            counts[edge[row] + 1] += 1
+        for index in range(1, len(counts)):
+            counts[index] += counts[index - 1]
+        offsets = array('l', counts)
+        targets = array('l', bytes(array('l').itemsize * len(edges)))
+        edge_ids = array('l', targets)
+        cursor = list(counts[:-1])
+        for edge_id, edge in enumerate(edges):
+            position = cursor[edge[row]]
+            targets[position] = edge[column]
+            edge_ids[position] = edge_id
+            cursor[edge[row]] += 1
+        return offsets, targets, edge_ids
+
+    def upsert(self, relationship: dict):
+        """
+        Add or replace one relationship without rebuilding the index. A partial relationship
+        (e.g. only a new reputation) is merged into the one it updates, as Mongo merges the write.
+        """
+        with self._lock:
+            key = relationship_key(relationship)
+            current = self._pending.get(key)
+            if current is None and key in self._keys:
+                current = self._relationships[self._keys[key]]
+            self._pending[key] = {**current, **relationship} if current is not None else relationship
+            if len(self._pending) >= COMPACT_THRESHOLD:
+                self.compact()
+
+    def compact(self):
+        """Fold the pending writes into the CSR arrays."""
+        with self._lock:
+            relationships = {key: self._relationships[index] for key, index in self._keys.items()}
+            relationships.update(self._pending)
+            self._build(relationships)
+
+    def _edges(self, entity: str, offsets: array, targets: array, edge_ids: array, pending_side: str) -> list:
+        relationships = []
+        index = self._entities.get(entity)
+        if index is not None and index + 1 < len(offsets):
+            for position in range(offsets[index], offsets[index + 1]):
+                relationship = self._relationships[edge_ids[position]]
+                if relationship_key(relationship) not in self._pending:
+                    relationships.append(relationship)
+        relationships.extend(relationship for relationship in self._pending.values()
+                             if relationship.get(pending_side) == entity and relationship.get("from") and relationship.get("to"))
+        return relationships
+
+    def outgoing(self, entity: str) -> list:
+        """Relationships held by an entity towards others."""
+        with self._lock:
+            return self._edges(entity, self._out_offsets, self._out_targets, self._out_edges, "from")
+
+    def incoming(self, entity: str) -> list:
+        """Relationships others hold towards an entity."""
+        with self._lock:
+            return self._edges(entity, self._in_offsets, self._in_targets, self._in_edges, "to")
+
+    def entities(self) -> list:
+        with self._lock:
+            names = list(self.names)
+            for relationship in self._pending.values():
+                for name in (relationship.get("from"), relationship.get("to")):
+                    if name and name not in self._entities and name not in names:
+                        names.append(name)
+            return names
+
+    def mutual_hostility(self, threshold: int, entity: Union[str, None]=None) -> list:
+        """
+        Pairs of entities whose reputations towards each other are both below ``threshold``.
+
+        :param threshold: Reputation below which a relationship counts as hostile.
+        :param entity: Only return the pairs this entity is part of.
+        """
+        pairs = []
+        for source in ([entity] if entity else self.entities()):
+            for relationship in self.outgoing(source):
+                reputation = relationship.get("reputation")
+                if reputation is None or reputation >= threshold:
+                    continue
+                target = relationship["to"]
+                if entity is None and target < source:
+                    continue
+                for reverse in self.outgoing(target):
+                    if reverse["to"] == source and reverse.get("reputation") is not None and reverse["reputation"] < threshold:
+                        pairs.append({"entities": [source, target],
+                                      "reputation": [reputation, reverse["reputation"]]})
+        return pairs
+
+    def alliance_chain(self, source: str, target: str, threshold: int) -> Union[list, None]:
+        """
+        Shortest chain of alliances leading from ``source`` to ``target``.
+
+        Only relationships with a reputation of at least ``threshold`` are followed.
+
+        :return: The relationships making up the chain, or None if there is none.
+        """
+        previous = {source: None}
+        queue = deque([source])
+        while queue:
+            entity = queue.popleft()
+            if entity == target:
+                chain = []
+                while previous[entity] is not None:
+                    chain.append(previous[entity])
+                    entity = previous[entity]["from"]
+                return chain[::-1]
+            for relationship in self.outgoing(entity):
+                reputation = relationship.get("reputation")
+                if reputation is not None and reputation >= threshold and relationship["to"] not in previous:
+                    previous[relationship["to"]] = relationship
+                    queue.append(relationship["to"])
+        return None
+
+
+def _apply_relationship_writes(graph: RelationshipGraph, collection_name: str, relationships: list):
+    for relationship in relationships:
+        graph.upsert(relationship)
+
+graphs = WorldIndex(lambda world_name, from_file: RelationshipGraph(world_relationships(world_name, from_file)),
+                    "Relationships", _apply_relationship_writes)
+
+def world_graph(world_name: str, from_file: bool=False) -> Union[RelationshipGraph, None]:
+    """The relationship graph of a world, or None if the world does not exist."""
+    return graphs.get(world_name, from_file)
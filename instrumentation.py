@@ -0,0 +1,203 @@
+import threading
+import time
+from bisect import bisect_left
+from collections import Counter
+
+import bson
+from flask import current_app, g, has_app_context, has_request_context, request
+from pymongo import monitoring
+
+from config import Config
+
+# Upper bounds of the latency histogram buckets, in seconds
+DURATION_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+# Upper bounds of the commands per request histogram buckets
+COUNT_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 200, 500)
+
+
+#region Metrics
+
+class Histogram:
+    """Cumulative histogram of observations, one series per label set."""
+
+    def __init__(self, name: str, help: str, buckets: tuple):
+        self.name = name
+        self.help = help
+        self.buckets = buckets
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, labels: tuple, value: float):
+        with self._lock:
+            counts, total = self._series.get(labels, ([0] * (len(self.buckets) + 1), 0.0))
+            counts[bisect_left(self.buckets, value)] += 1
+            self._series[labels] = (counts, total + value)
+
+    def render(self, label_names: tuple) -> list:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            series = {labels: (list(counts), total) for labels, (counts, total) in self._series.items()}
+        for labels, (counts, total) in sorted(series.items()):
+            label_text = ",".join(f'{name}="{value}"' for name, value in zip(label_names, labels))
+            cumulative = 0
+            for bound, count in zip((*self.buckets, "+Inf"), counts):
+                cumulative += count
+                lines.append(f'{self.name}_bucket{{{label_text}{"," if label_text else ""}le="{bound}"}} {cumulative}')
+            lines.append(f"{self.name}_sum{{{label_text}}} {total}")
+            lines.append(f"{self.name}_count{{{label_text}}} {cumulative}")
+        return lines
+
+class CounterMetric:
+    """Monotonic counter, one series per label set."""
+
+    def __init__(self, name: str, help: str):
+        self.name = name
+        self.help = help
+        self._series = Counter()
+        self._lock = threading.Lock()
+
+    def inc(self, labels: tuple, value: float=1):
+        with self._lock:
+            self._series[labels] += value
+
+    def render(self, label_names: tuple) -> list:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            series = dict(self._series)
+        for labels, value in sorted(series.items()):
+            label_text = ",".join(f'{name}="{value}"' for name, value in zip(label_names, labels))
+            lines.append(f"{self.name}{{{label_text}}} {value}")
+        return lines
+
+# Metric -> names of its labels
+COMMAND_LABELS = ("endpoint", "command")
+ENDPOINT_LABELS = ("endpoint",)
+
+command_duration = Histogram("worldgen_mongo_command_duration_seconds", "Duration of Mongo commands.", DURATION_BUCKETS)
+command_failures = CounterMetric("worldgen_mongo_command_failures_total", "Mongo commands that failed.")
+# Only measured with MONGO_METRICS_REPLY_BYTES, otherwise neither rendered nor reported
+reply_bytes = (CounterMetric("worldgen_mongo_reply_bytes_total", "BSON size of the replies to Mongo commands.")
+               if Config.MONGO_METRICS_REPLY_BYTES else None)
+request_duration = Histogram("worldgen_request_duration_seconds", "Duration of HTTP requests.", DURATION_BUCKETS)
+request_commands = Histogram("worldgen_mongo_commands_per_request", "Mongo commands issued per HTTP request.", COUNT_BUCKETS)
+budget_exceeded = CounterMetric("worldgen_mongo_query_budget_exceeded_total", "Requests that issued more Mongo commands than MONGO_QUERY_BUDGET.")
+
+def render_metrics() -> str:
+    """Every metric in the Prometheus text exposition format."""
+    lines = []
+    lines += command_duration.render(COMMAND_LABELS)
+    lines += command_failures.render(COMMAND_LABELS)
+    if reply_bytes is not None:
+        lines += reply_bytes.render(COMMAND_LABELS)
+    lines += request_duration.render(ENDPOINT_LABELS)
+    lines += request_commands.render(ENDPOINT_LABELS)
+    lines += budget_exceeded.render(ENDPOINT_LABELS)
+    return "\n".join(lines) + "\n"
+
+#endregion Metrics
+
+#region Command listener
+
+class RequestStats:
+    """The Mongo commands issued while serving one request."""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.commands = Counter()
+        self.duration = 0.0
+        self.bytes = 0
+
+def _endpoint() -> str:
+    if has_request_context():
+        return request.endpoint or "unmatched"
+    return "background"
+
+def _request_stats():
+    return g.get('mongo_stats') if has_app_context() else None
+
+class CommandMetrics(monitoring.CommandListener):
+    """
+    Records every Mongo command of the client it is registered on, see `db.client_options`.
+
+    pymongo publishes command events on the thread that issued the command, so each one is
+    attributed to the Flask request being served there, if any.
+    """
+
+    def started(self, event):
+        pass
+
+    def succeeded(self, event):
+        duration = event.duration_micros / 1e6
+        labels = (_endpoint(), event.command_name)
+        command_duration.observe(labels, duration)
+        size = 0
+        if reply_bytes is not None:
+            size = len(bson.encode(event.reply))
+            reply_bytes.inc(labels, size)
+        stats = _request_stats()
+        if stats is not None:
+            stats.commands[event.command_name] += 1
+            stats.duration += duration
+            stats.bytes += size
+
+    def failed(self, event):
+        duration = event.duration_micros / 1e6
+        labels = (_endpoint(), event.command_name)
+        command_duration.observe(labels, duration)
+        command_failures.inc(labels)
+        stats = _request_stats()
+        if stats is not None:
+            stats.commands[event.command_name] += 1
+            stats.duration += duration
+
+command_metrics = CommandMetrics()
+
+#endregion Command listener
+
+#region Flask integration
+
+def start_request():
+    g.mongo_stats = RequestStats()
+
+def finish_request(response):
+    """
+    Report the request's Mongo commands in Server-Timing and the metrics, and check the budget.
+
+    A streamed body is read after this runs, and the commands issued while it is sent are
+    counted too, so the metrics and the budget of a streamed response are recorded when it is
+    closed; its Server-Timing header can only cover the commands issued before the body.
+    """
+    stats = _request_stats()
+    if stats is None:
+        return response
+    total = sum(stats.commands.values())
+    elapsed = time.perf_counter() - stats.started
+    desc = f"{total} commands, {stats.bytes} bytes" if reply_bytes is not None else f"{total} commands"
+    response.headers.add('Server-Timing', f'mongo;dur={stats.duration * 1000:.2f};desc="{desc}"')
+    response.headers.add('Server-Timing', f'app;dur={elapsed * 1000:.2f}')
+    # The request context may be gone by the time a response is closed, so capture what is reported
+    report = (stats, _endpoint(), current_app.config['MONGO_QUERY_BUDGET'], current_app.logger,
+              request.method, request.path)
+    if response.is_streamed:
+        response.call_on_close(lambda: record_request(*report))
+    else:
+        record_request(*report)
+    return response
+
+def record_request(stats: RequestStats, endpoint: str, budget: int, logger, method: str, path: str):
+    """Add a finished request to the metrics and warn if it went over the query budget."""
+    total = sum(stats.commands.values())
+    request_duration.observe((endpoint,), time.perf_counter() - stats.started)
+    request_commands.observe((endpoint,), total)
+    if budget and total > budget:
+        budget_exceeded.inc((endpoint,))
+        logger.warning("%s %s issued %d Mongo commands, over the budget of %d: %s",
+                       method, path, total, budget, dict(stats.commands))
+
+def init_app(app):
+    """Attribute Mongo commands to the requests of an app and expose them at /metrics."""
+    app.before_request(start_request)
+    app.after_request(finish_request)
+    app.add_url_rule('/metrics', 'metrics', lambda: (render_metrics(), 200, {'Content-Type': 'text/plain; version=0.0.4'}))
+
+#endregion Flask integration
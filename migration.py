@@ -0,0 +1,434 @@
+import json
+import os
+import uuid
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from datetime import datetime
+from itertools import islice
+from typing import Iterator, Union
+
+from bson import ObjectId
+from marshmallow import ValidationError
+from pymongo import ReplaceOne
+
+import db
+import validation
+from config import Config
+from schemas.group_schema import Group_Types
+from utils import iter_references, referencing_fields, refresh_world_ids, version_bump, world_names
+
+# File of the Worlds/<world>/ layout -> (collection, schema its records are validated with, layout)
+# Layouts: "list" is an array of objects, "keyed" an object of objects by name (the key is
+# stored as the object's "name"), "single" the one object under the "geography" key.
+CATEGORY_FILES = {
+    "geography.json":     ("Geography",     "GeographySchema",    "single"),
+    "groups.json":        ("Groups",        "GroupSchema",        "list"),
+    "leaders.json":       ("Leaders",       "LeaderSchema",       "list"),
+    "relationships.json": ("Relationships", "RelationshipSchema", "keyed"),
+    "history.json":       ("Eras",          "EraSchema",          "keyed"),
+    "pantheon.json":      ("Gods",          "GodSchema",          "list"),
+    "magic.json":         ("Magic",         "MagicSourceSchema",  "list"),
+}
+
+# Files holding the names other records refer to, read before anything is written
+REFERENCE_FILES = ("groups.json", "leaders.json", "relationships.json")
+
+# Validation errors kept in the report of each file
+MAX_REPORTED_ERRORS = 10
+
+# Schema -> fields the files store as lists of ids or names of other records (leaders list their
+# relationships) while the schema nests the records themselves; such lists are checked as
+# references, as the world document's reference fields are, not against the nested schema
+REFERENCE_LIST_FIELDS = {
+    "LeaderSchema": ("relationships",),
+}
+
+# Namespace of the ids derived for records without one, see `ReferenceMap.record_id`
+RECORD_ID_NAMESPACE = uuid.UUID("5d1f7c0e-3b8a-4e52-9a61-2f0c8d4b7e93")
+
+
+#region Streaming JSON
+
+class JSONStream:
+    """
+    Incremental reader of the top level of a JSON document.
+
+    The file is read ``chunk_size`` characters at a time and one value of the top-level array
+    or object is decoded at a time, so a category file is never held in memory whole.
+    """
+
+    def __init__(self, file, chunk_size: int):
+        self.file = file
+        self.chunk_size = chunk_size
+        self.buffer = ""
+        self.position = 0
+        self.eof = False
+        self.decoder = json.JSONDecoder()
+
+    def _read(self) -> bool:
+        chunk = self.file.read(self.chunk_size)
+        if not chunk:
+            self.eof = True
+            return False
+        self.buffer = self.buffer[self.position:] + chunk
+        self.position = 0
+        return True
+
+    def peek(self) -> str:
+        """The next character that is not whitespace, '' at the end of the file."""
+        while True:
+            while self.position < len(self.buffer) and self.buffer[self.position].isspace():
+                self.position += 1
+            if self.position < len(self.buffer) or not self._read():
+                return self.buffer[self.position:self.position + 1]
+
+    def expect(self, chars: str) -> str:
+        char = self.peek()
+        if not char or char not in chars:
+            raise json.JSONDecodeError(f"Expected one of {chars!r}", self.buffer, self.position)
+        self.position += 1
+        return char
+
+    def value(self) -> object:
+        self.peek()
+        while True:
+            try:
+                value, end = self.decoder.raw_decode(self.buffer, self.position)
+            except json.JSONDecodeError:
+                if self._read():
+                    continue
+                raise
+            # A number ending the buffer may go on in the next chunk
+            if end == len(self.buffer) and not self.eof and self._read():
+                continue
+            self.position = end
+            return value
+
+def iter_json(file_path: str, chunk_size: Union[int, None]=None) -> Iterator:
+    """
+    Yield (key, value) for every member of the top-level object of a JSON file, or
+    (position, value) for every element of its top-level array.
+    """
+    with open(file_path, 'r', encoding='utf-8') as file:
+        stream = JSONStream(file, chunk_size or Config.STREAM_CHUNK_BYTES)
+        closing = "]" if stream.expect("[{") == "[" else "}"
+        if stream.peek() == closing:
+            return
+        position = 0
+        while True:
+            if closing == "}":
+                key = stream.value()
+                stream.expect(":")
+            else:
+                key = position
+            yield key, stream.value()
+            position += 1
+            if stream.expect("," + closing) == closing:
+                return
+
+def iter_records(file_path: str, layout: str) -> Iterator:
+    """Yield (key, record) for every record of a category file."""
+    for key, value in iter_json(file_path):
+        if layout != "single" or key == "geography":
+            yield key, value
+
+def _batches(items: Iterator, size: int) -> Iterator:
+    items = iter(items)
+    while batch := list(islice(items, size)):
+        yield batch
+
+#endregion Streaming JSON
+
+#region Import
+
+def _object_id(value: object) -> Union[ObjectId, None]:
+    if isinstance(value, dict) and set(value) == {"$oid"}:
+        value = value["$oid"]
+    if isinstance(value, ObjectId):
+        return value
+    if isinstance(value, str) and ObjectId.is_valid(value):
+        return ObjectId(value)
+    return None
+
+def _decode(value: object) -> object:
+    """A record with its extended JSON ids (``{"$oid": ...}``) as ObjectIds."""
+    if isinstance(value, dict):
+        if set(value) == {"$oid"}:
+            return _object_id(value) or value
+        return {key: _decode(item) for key, item in value.items()}
+    if isinstance(value, list):
+        return [_decode(item) for item in value]
+    return value
+
+class ReferenceMap:
+    """
+    The names the records of a world refer to each other by, from a first pass over its files.
+
+    Maps the short names of groups and leaders to their names, and the names of relationships
+    to their ids, and fixes the id of every record that has none, so that records can be
+    rewritten one batch at a time in any order.
+    """
+
+    def __init__(self, world_name: str):
+        self.world_name = world_name
+        self.entities = {}       # short_name -> name
+        self.relationships = {}  # relationship name or id -> ObjectId
+
+    def record_id(self, file_name: str, key: object, record: dict) -> ObjectId:
+        """
+        The record's own _id, or one derived from the world, the file and the record's key (its
+        name in keyed files, its position in lists), so that every import of the same files
+        gives a record the same id and upserts it in place.
+        """
+        obj_id = _object_id(record.get("_id"))
+        if obj_id is None:
+            obj_id = ObjectId(uuid.uuid5(RECORD_ID_NAMESPACE, f"{self.world_name}/{file_name}/{key}").bytes[:12])
+        return obj_id
+
+    @classmethod
+    def scan(cls, world_dir: str) -> 'ReferenceMap':
+        references = cls(os.path.basename(os.path.normpath(world_dir)))
+        for file_name in REFERENCE_FILES:
+            file_path = os.path.join(world_dir, file_name)
+            if not os.path.exists(file_path):
+                continue
+            for key, record in iter_records(file_path, CATEGORY_FILES[file_name][2]):
+                if not isinstance(record, dict):
+                    continue
+                obj_id = references.record_id(file_name, key, record)
+                if file_name == "relationships.json":
+                    references.relationships[record.get("name", key)] = obj_id
+                    references.relationships[str(obj_id)] = obj_id
+                elif record.get("short_name") and record.get("name"):
+                    references.entities[record["short_name"]] = record["name"]
+        return references
+
+    def rewrite(self, file_name: str, key: object, record: dict) -> dict:
+        """
+        The document stored for a record: ids as ObjectIds, relationships listed by name or id
+        as relationship ids, and the ends of relationships given by short name as full names.
+        """
+        doc = _decode(record)
+        doc["_id"] = self.record_id(file_name, key, record)
+        if CATEGORY_FILES[file_name][2] == "keyed":
+            doc.setdefault("name", key)
+        if isinstance(doc.get("relationships"), list):
+            doc["relationships"] = [self.relationships.get(ref, ref) if isinstance(ref, str) else ref
+                                    for ref in doc["relationships"]]
+        if file_name == "relationships.json":
+            for side in ("from", "to"):
+                if doc.get(side) in self.entities:
+                    doc[side] = self.entities[doc[side]]
+        return doc
+
+def _is_reference(value: object) -> bool:
+    return isinstance(value, str) or _object_id(value) is not None
+
+def _validate(schema_name: str, records: list, fast: bool) -> dict:
+    """Run in the worker processes: the validation messages of a batch, by position."""
+    reference_fields = REFERENCE_LIST_FIELDS.get(schema_name, ())
+    references = {}
+    if reference_fields:
+        stripped = []
+        for position, record in enumerate(records):
+            if isinstance(record, dict):
+                lists = {field: record[field] for field in reference_fields if isinstance(record.get(field), list)}
+                if lists:
+                    references[position] = lists
+                    record = {field: value for field, value in record.items() if field not in lists}
+            stripped.append(record)
+        records = stripped
+    try:
+        validation.load(schema_name, records, many=True, fast=fast)
+        messages = {}
+    except ValidationError as err:
+        if not isinstance(err.messages, dict):
+            return {"_schema": err.messages}
+        messages = err.messages
+    for position, lists in references.items():
+        for field, value in lists.items():
+            if not all(_is_reference(item) for item in value):
+                messages.setdefault(position, {})[field] = ["Must be a list of ids or names."]
+    return messages
+
+def _ready(_: int):
+    pass
+
+def _world_field(collection_name: str, doc: dict) -> Union[str, None]:
+    """The world field referencing a document, None for groups of no known type."""
+    if collection_name == "Groups":
+        return f"{doc.get('type')}s" if doc.get("type") in Group_Types else None
+    return referencing_fields(collection_name)[0]
+
+def _write_batch(file_name: str, batch: list, errors: dict, references: ReferenceMap, refs: dict,
+                 report: dict, skip_invalid: bool):
+    collection_name = CATEGORY_FILES[file_name][0]
+    operations = []
+    for position, (key, record) in enumerate(batch):
+        messages = errors.get(position)
+        if messages is not None or not isinstance(record, dict):
+            report["invalid"] += 1
+            if len(report["errors"]) < MAX_REPORTED_ERRORS:
+                report["errors"][str(key)] = messages
+            if skip_invalid or not isinstance(record, dict):
+                continue
+        doc = references.rewrite(file_name, key, record)
+        field = _world_field(collection_name, doc)
+        if field is None:
+            # No world field would reference it, so it would only be an orphan in the collection
+            report["unreferenced"] += 1
+            if str(key) in report["errors"] or len(report["errors"]) < MAX_REPORTED_ERRORS:
+                messages = report["errors"].get(str(key)) or {}
+                report["errors"][str(key)] = {**messages, "type": [*messages.get("type", []), f"Not a group type: {doc.get('type')}"]}
+            continue
+        refs.setdefault(field, []).append(doc["_id"])
+        operations.append(ReplaceOne({"_id": doc["_id"]}, doc, upsert=True))
+    if operations:
+        db.collections[collection_name].bulk_write(operations, ordered=False)
+        report["written"] += len(operations)
+
+def import_world(world_dir: str, pool: ProcessPoolExecutor, batch_size: Union[int, None]=None,
+                 skip_invalid: bool=False) -> dict:
+    """
+    Import a world from its ``Worlds/<world>/`` directory into Mongo.
+
+    Every category file is streamed in batches of ``batch_size`` records, validated in ``pool``
+    and written with one ``bulk_write`` per batch, at most IMPORT_PENDING_BATCHES batches being
+    held at a time. Records are upserted by _id, their own or one derived from their place in
+    the files (see `ReferenceMap.record_id`), so importing the same world again updates it in
+    place. The world document then references every imported record. Groups of no known type
+    would be referenced by no world field, so they are reported as unreferenced, not written.
+
+    :param skip_invalid: Leave out the records that fail validation instead of importing them.
+    :return: Per file, the number of records read, written, invalid and unreferenced, and the
+        first errors.
+    """
+    world_name = os.path.basename(os.path.normpath(world_dir))
+    batch_size = batch_size or Config.IMPORT_BATCH_SIZE
+    references = ReferenceMap.scan(world_dir)
+    refs = {}
+    report = {}
+    for file_name, (_, schema_name, layout) in CATEGORY_FILES.items():
+        file_path = os.path.join(world_dir, file_name)
+        if not os.path.exists(file_path):
+            continue
+        file_report = report[file_name] = {"records": 0, "written": 0, "invalid": 0, "unreferenced": 0, "errors": {}}
+        pending = deque()
+        for batch in _batches(iter_records(file_path, layout), batch_size):
+            file_report["records"] += len(batch)
+            records = [record for _, record in batch]
+            pending.append((batch, pool.submit(_validate, schema_name, records, Config.FAST_BULK_VALIDATION)))
+            if len(pending) >= Config.IMPORT_PENDING_BATCHES:
+                batch, future = pending.popleft()
+                _write_batch(file_name, batch, future.result(), references, refs, file_report, skip_invalid)
+        while pending:
+            batch, future = pending.popleft()
+            _write_batch(file_name, batch, future.result(), references, refs, file_report, skip_invalid)
+
+    fields = {field: ids for field, ids in refs.items() if field is not None}
+    if "Geography" in fields:
+        fields["Geography"] = fields["Geography"][0]
+    result = db.collections["Worlds"].update_one({"WorldName": world_name}, {"$set": fields, **version_bump()}, upsert=True)
+    if result.upserted_id is not None:
+        # A new world, which the world id map and name list must pick up as create_world does
+        refresh_world_ids()
+        world_names.invalidate()
+    return report
+
+def import_worlds(world_dirs: list, workers: Union[int, None]=None, **options) -> dict:
+    """
+    Import worlds concurrently, see `import_world`. The records of every world are validated in
+    one pool of ``workers`` processes, one per core by default.
+
+    :return: The report of every world, by name.
+    """
+    workers = workers or Config.MIGRATION_WORKERS or os.cpu_count()
+    with ProcessPoolExecutor(workers) as pool:
+        # Start every worker process before any thread, forking a threaded process is unsafe
+        list(pool.map(_ready, range(workers)))
+        with ThreadPoolExecutor(max(1, min(len(world_dirs), workers))) as threads:
+            futures = {os.path.basename(os.path.normpath(world_dir)): threads.submit(import_world, world_dir, pool, **options)
+                       for world_dir in world_dirs}
+            return {world_name: future.result() for world_name, future in futures.items()}
+
+#endregion Import
+
+#region Export
+
+def _encode(value: object, key: Union[str, None]=None) -> object:
+    """A document as JSON: its _id in extended JSON, as the files store it, and other ids as strings."""
+    if isinstance(value, ObjectId):
+        return {"$oid": str(value)} if key == "_id" else str(value)
+    if isinstance(value, datetime):
+        return value.isoformat()
+    if isinstance(value, dict):
+        return {name: _encode(item, name) for name, item in value.items()}
+    if isinstance(value, list):
+        return [_encode(item) for item in value]
+    return value
+
+def _members(data: Union[list, dict]) -> str:
+    """The members of a one member array or object, rendered as ``json.dump`` renders them in a file."""
+    return json.dumps(data, indent=Config.JSON_INDENT)[1:-1].strip("\n")
+
+def export_category(world: dict, file_name: str, world_dir: str, batch_size: Union[int, None]=None) -> Union[int, None]:
+    """
+    Write the category file of a world from the objects its world document references.
+
+    Objects are fetched and written one batch at a time, to a temporary file that replaces the
+    category file once complete.
+
+    :return: The number of objects written, None if the world references none.
+    """
+    collection_name, _, layout = CATEGORY_FILES[file_name]
+    refs = []
+    for field in referencing_fields(collection_name):
+        value = world.get(field)
+        refs += value if isinstance(value, list) else [value] if value is not None else []
+    if not refs:
+        return None
+    objects = (_encode(obj) for obj in iter_references(collection_name, refs, batch_size=batch_size)
+               if isinstance(obj, dict))
+
+    file_path = os.path.join(world_dir, file_name)
+    temp_path = f"{file_path}.tmp"
+    count = 0
+    with open(temp_path, 'w', encoding='utf-8') as file:
+        if layout == "single":
+            obj = next(objects, None)
+            count = int(obj is not None)
+            json.dump({"world_name": world["WorldName"], "geography": obj}, file, indent=Config.JSON_INDENT)
+        else:
+            opening, closing = ("{", "}") if layout == "keyed" else ("[", "]")
+            file.write(opening)
+            for obj in objects:
+                member = {obj.get("name", obj["_id"]["$oid"]): obj} if layout == "keyed" else [obj]
+                file.write(("," if count else "") + "\n" + _members(member))
+                count += 1
+            file.write(("\n" if count else "") + closing)
+    os.replace(temp_path, file_path)
+    return count
+
+def export_worlds(world_names: list, worlds_dir: str, workers: Union[int, None]=None, batch_size: Union[int, None]=None) -> dict:
+    """
+    Export worlds to the ``Worlds/`` layout under ``worlds_dir``, every category file of every
+    world being written concurrently by a pool of ``workers`` threads.
+
+    :return: The number of objects written per file of every world, by name.
+    """
+    workers = workers or Config.MIGRATION_WORKERS or os.cpu_count()
+    worlds = list(db.collections["Worlds"].find({"WorldName": {"$in": list(world_names)}}))
+    for world in worlds:
+        os.makedirs(os.path.join(worlds_dir, world["WorldName"]), exist_ok=True)
+    with ThreadPoolExecutor(workers) as threads:
+        futures = {(world["WorldName"], file_name): threads.submit(export_category, world, file_name,
+                                                                   os.path.join(worlds_dir, world["WorldName"]), batch_size)
+                   for world in worlds for file_name in CATEGORY_FILES}
+        report = {world["WorldName"]: {} for world in worlds}
+        for (world_name, file_name), future in futures.items():
+            count = future.result()
+            if count is not None:
+                report[world_name][file_name] = count
+    return report
+
+#endregion Export
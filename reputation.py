@@ -0,0 +1,144 @@
+import threading
+from typing import Union
+
+import numpy as np
+
+from derived import WorldIndex
+from graph import world_relationships
+
+
+def _cell_key(relationship: dict) -> str:
+    return str(relationship.get("_id") or relationship.get("name"))
+
+
+class ReputationMatrix:
+    """
+    Dense matrix of the reputations between the entities of a world.
+
+    ``matrix[i, j]`` is the reputation entity ``i`` holds towards entity ``j``, NaN where there
+    is no relationship. Every aggregate is answered with whole-matrix NumPy operations.
+    """
+
+    def __init__(self, relationships: list):
+        relationships = [relationship for relationship in relationships
+                         if relationship.get("from") and relationship.get("to") and relationship.get("reputation") is not None]
+        self.names = sorted({name for relationship in relationships for name in (relationship["from"], relationship["to"])})
+        self.index = {name: position for position, name in enumerate(self.names)}
+        self.matrix = np.full((len(self.names), len(self.names)), np.nan)
+        # Relationship -> the cell holding its reputation, so it can be cleared when its ends change
+        self._cells = {_cell_key(relationship): (self.index[relationship["from"]], self.index[relationship["to"]])
+                       for relationship in relationships}
+        # Writers hold the lock; readers take a consistent (names, matrix) snapshot under it
+        self._lock = threading.Lock()
+        if relationships:
+            rows = np.fromiter((self.index[relationship["from"]] for relationship in relationships), dtype=np.intp)
+            columns = np.fromiter((self.index[relationship["to"]] for relationship in relationships), dtype=np.intp)
+            values = np.fromiter((relationship["reputation"] for relationship in relationships), dtype=float)
+            self.matrix[rows, columns] = values
+
+    def _position(self, name: str) -> int:
+        position = self.index.get(name)
+        if position is None:
+            # The grown matrix is built aside and swapped in with the name, under the lock
+            matrix = np.pad(self.matrix, ((0, 1), (0, 1)), constant_values=np.nan)
+            position = len(self.names)
+            self.names = self.names + [name]
+            self.index = {**self.index, name: position}
+            self.matrix = matrix
+        return position
+
+    def _snapshot(self) -> tuple:
+        with self._lock:
+            return self.names, self.index, self.matrix
+
+    def set(self, source: str, target: str, reputation: Union[int, float, None]):
+        """Update the reputation ``source`` holds towards ``target``; None removes it."""
+        with self._lock:
+            self.matrix[self._position(source), self._position(target)] = np.nan if reputation is None else reputation
+
+    def update(self, relationship: dict):
+        """Apply a written relationship, clearing its previous cell when its ends changed."""
+        key = _cell_key(relationship)
+        with self._lock:
+            previous = self._cells.get(key)
+            if relationship.get("from") and relationship.get("to"):
+                cell = (self._position(relationship["from"]), self._position(relationship["to"]))
+            elif previous is not None:
+                cell = previous
+            else:
+                return
+            reputation = relationship["reputation"] if "reputation" in relationship else (
+                self.matrix[previous] if previous is not None else None)
+            if previous is not None and previous != cell:
+                self.matrix[previous] = np.nan
+            self.matrix[cell] = np.nan if reputation is None else reputation
+            self._cells[key] = cell
+
+    def standing(self) -> dict:
+        """Average reputation every entity is held in by the others, None if nobody rates it."""
+        names, _, matrix = self._snapshot()
+        known = ~np.isnan(matrix)
+        counts = known.sum(axis=0)
+        totals = np.where(known, matrix, 0.0).sum(axis=0)
+        averages = np.divide(totals, counts, out=np.full(len(names), np.nan), where=counts > 0)
+        return {name: (None if np.isnan(average) else float(average)) for name, average in zip(names, averages)}
+
+    def most_hated(self, limit: int=1) -> list:
+        """The entities with the lowest standing, lowest first."""
+        standing = self.standing()
+        rated = [(average, name) for name, average in standing.items() if average is not None]
+        return [{"entity": name, "standing": average} for average, name in sorted(rated)[:limit]]
+
+    def blocs(self, threshold: float) -> list:
+        """
+        Group the entities into blocs of mutual allies.
+
+        Two entities are allied when both hold the other at ``threshold`` or above; a bloc is a
+        connected component of that relation, found by propagating the smallest member index
+        along alliances until it stops changing.
+        """
+        names, _, matrix = self._snapshot()
+        size = len(names)
+        with np.errstate(invalid='ignore'):
+            allied = (matrix >= threshold) & (matrix.T >= threshold)
+        labels = np.arange(size)
+        while size:
+            neighbours = np.where(allied, labels[np.newaxis, :], size).min(axis=1)
+            updated = np.minimum(labels, neighbours)
+            if np.array_equal(updated, labels):
+                break
+            labels = updated
+        blocs = {}
+        for name, label in zip(names, labels):
+            blocs.setdefault(int(label), []).append(name)
+        return [members for members in blocs.values() if len(members) > 1]
+
+    def sides(self, first: str, second: str) -> dict:
+        """
+        Predict who would side with whom in a war between ``first`` and ``second``.
+
+        Every other entity joins the side it holds in higher regard; entities that rate both
+        the same, or neither, stay neutral.
+        """
+        names, index, matrix = self._snapshot()
+        if first not in index or second not in index:
+            raise KeyError(first if first not in index else second)
+        preference = np.nan_to_num(matrix[:, index[first]]) - np.nan_to_num(matrix[:, index[second]])
+        sides = {first: [], second: [], "neutral": []}
+        for name, score in zip(names, preference):
+            if name in (first, second):
+                continue
+            sides[first if score > 0 else second if score < 0 else "neutral"].append(name)
+        return sides
+
+
+def _apply_reputation_writes(matrix: ReputationMatrix, collection_name: str, relationships: list):
+    for relationship in relationships:
+        matrix.update(relationship)
+
+matrices = WorldIndex(lambda world_name, from_file: ReputationMatrix(world_relationships(world_name, from_file)),
+                      "Relationships", _apply_reputation_writes)
+
+def world_reputation(world_name: str, from_file: bool=False) -> Union[ReputationMatrix, None]:
+    """The reputation matrix of a world, or None if the world does not exist."""
+    return matrices.get(world_name, from_file)
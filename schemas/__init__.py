@@ -2,11 +2,13 @@
 
 from .geography_schema    import GeographySchema                         # noqa: F401
 from .group_schema        import GroupSchema,    KindomPropertySchema    # noqa: F401
+from .history_schema      import EraSchema,      PeriodSchema            # noqa: F401
 from .leader_schema       import LeaderSchema                            # noqa: F401
 from .magic_schema        import MagicSchema,    MagicSourceSchema       # noqa: F401
 from .pantheon_schema     import PantheonSchema, GodSchema               # noqa: F401
 from .world_schema        import WorldSchema                             # noqa: F401
 from .relationship_schema import RelationshipSchema, IntelligenceSchema  # noqa: F401
+from .indexes             import INDEXES,        TEXT_INDEXES, VIEW_INDEXES  # noqa: F401
 
 #region Basic Schemas
 
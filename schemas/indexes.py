@@ -0,0 +1,33 @@
+from pymongo import ASCENDING, TEXT, IndexModel
+
+# Indexes backing the queries of the API, by collection. Applied by `db.ensure_indexes`.
+INDEXES = {
+    "Worlds": [
+        IndexModel([("WorldName", ASCENDING)], name="WorldName_unique", unique=True),
+    ],
+    "Groups": [
+        IndexModel([("type", ASCENDING)], name="type"),
+    ],
+    "Relationships": [
+        IndexModel([("from", ASCENDING)], name="from"),
+        IndexModel([("to", ASCENDING)], name="to"),
+        IndexModel([("name", ASCENDING)], name="name"),
+    ],
+    "Leaders": [
+        IndexModel([("short_name", ASCENDING)], name="short_name"),
+    ],
+}
+
+# Wildcard text indexes used when SEARCH_BACKEND is "mongo", see `search.mongo_search`
+TEXT_INDEXES = {
+    collection_name: [IndexModel([("$**", TEXT)], name="text")]
+    for collection_name in ("Geography", "Groups", "Leaders", "Relationships", "Magic", "Eras", "Gods")
+}
+
+# Indexes of the materialized world views, applied when USE_WORLD_VIEWS is set, see `views`
+VIEW_INDEXES = {
+    "WorldViews": [
+        IndexModel([("WorldName", ASCENDING)], name="WorldName_unique", unique=True),
+        IndexModel([("_refs", ASCENDING)], name="refs"),
+    ],
+}
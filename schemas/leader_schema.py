@@ -2,6 +2,8 @@ from apiflask import Schema
 from apiflask.fields import String, List, Dict, Nested
 
 class LeaderSchema(Schema):
+    name       = String(title='Name', description='Name of the leader')
+    short_name = String(title='Short Name', description='Short name of the leader')
     kingdom = String(title='Kingdom', description='Kingdom of the leader', required=False)
     faction = String(title='Faction', description='Faction of the leader', required=False)
     traits  = List(String(title='Trait', description='Trait of the leader'))
@@ -0,0 +1,214 @@
+import math
+import re
+import threading
+from collections import Counter
+from typing import Union
+
+from apiflask.fields import Dict, List, String
+from bson import ObjectId
+
+import db
+import utils
+import validation
+from config import Config
+from derived import WorldIndex
+
+TOKEN = re.compile(r"\w+")
+
+
+def _is_text(field) -> bool:
+    if isinstance(field, String):
+        return True
+    if isinstance(field, List):
+        return isinstance(field.inner, String)
+    if isinstance(field, Dict):
+        return isinstance(field.value_field, String)
+    return False
+
+def searchable_fields() -> set:
+    """Names of every string, list of strings or dict of strings field declared in the schemas."""
+    fields = set()
+    for schema_name in Config.SCHEMA_CLASSES:
+        for name, field in validation.schema(schema_name).fields.items():
+            if _is_text(field):
+                # The JSON files spell some fields with spaces ("major events")
+                fields.update((name, name.replace('_', ' ')))
+    return fields
+
+SEARCHABLE_FIELDS = searchable_fields()
+
+def tokenize(text: str) -> list:
+    return [token for token in TOKEN.findall(text.lower()) if not ObjectId.is_valid(token)]
+
+def entity_text(entity: object, searchable: bool=False) -> list:
+    """Tokens of the searchable fields of an entity, descending into nested objects."""
+    tokens = []
+    if isinstance(entity, str):
+        if searchable:
+            tokens.extend(tokenize(entity))
+    elif isinstance(entity, dict):
+        for key, value in entity.items():
+            tokens.extend(entity_text(value, searchable or key in SEARCHABLE_FIELDS))
+    elif isinstance(entity, list):
+        for item in entity:
+            tokens.extend(entity_text(item, searchable))
+    return tokens
+
+def entity_name(entity: dict, default: str) -> str:
+    return str(entity.get("name") or entity.get("_id") or default)
+
+def entity_key(entity: dict, default: str) -> str:
+    """
+    Identity of an entity in the index: its _id, which every stored entity carries, or for an
+    entity of a world file without one its name (or ``default``).
+    """
+    obj_id = entity.get("_id")
+    if isinstance(obj_id, dict) and "$oid" in obj_id:
+        obj_id = obj_id["$oid"]
+    return str(obj_id or entity.get("name") or default)
+
+def world_entities(world_name: str, from_file: bool=False):
+    """Yield (category, entity key, entity name, entity) for every entity of a world."""
+    if from_file:
+        world = utils.world_data(world_name, from_file)
+        for category, data in world.items():
+            if isinstance(data, list):
+                for position, entity in enumerate(data):
+                    if isinstance(entity, dict):
+                        yield category, entity_key(entity, str(position)), entity_name(entity, str(position)), entity
+            elif isinstance(data, dict) and data and all(isinstance(entity, dict) for entity in data.values()):
+                for name, entity in data.items():
+                    yield category, entity_key(entity, name), name, entity
+            elif isinstance(data, dict):
+                yield category, category, category, data
+        return
+    world = utils.world_data(world_name)
+    for field, data in world.items():
+        collection_name = utils.reference_collection(field)
+        if collection_name is None:
+            continue
+        for position, entity in enumerate(data if isinstance(data, list) else [data]):
+            if isinstance(entity, dict):
+                yield collection_name, entity_key(entity, str(position)), entity_name(entity, str(position)), entity
+
+
+class SearchIndex:
+    """
+    Inverted index over the text of a world's entities.
+
+    Entities are keyed by category and `entity_key`, so entities sharing a name stay apart and
+    a renamed entity replaces its old postings. Every token maps to the entities containing it
+    with its count there. Hits are ranked by
+    the sum over the query tokens of a saturated term frequency ``tf / (tf + 1.2)`` times the
+    inverse document frequency ``log(1 + N / df)``.
+    """
+
+    def __init__(self, entities=()):
+        self._postings = {}
+        self._documents = {}
+        self._entities = {}  # (category, key) -> (name, entity) as indexed
+        self._lock = threading.RLock()
+        for category, key, name, entity in entities:
+            self.add(category, key, name, entity)
+
+    def add(self, category: str, key: str, name: str, entity: object):
+        """Index an entity, replacing what was indexed for it before."""
+        counts = Counter(entity_text(entity) + tokenize(name))
+        with self._lock:
+            self.remove(category, key)
+            self._documents[(category, key)] = counts
+            self._entities[(category, key)] = (name, entity)
+            for token, count in counts.items():
+                self._postings.setdefault(token, {})[(category, key)] = count
+
+    def update(self, category: str, entity: dict):
+        """
+        Index a written entity. A partial write (e.g. without its name) is merged into the
+        entity indexed under the same _id, as Mongo merges the write.
+        """
+        key = entity_key(entity, "")
+        with self._lock:
+            previous = self._entities.get((category, key))
+            if previous is not None:
+                entity = {**previous[1], **entity}
+            self.add(category, key, entity_name(entity, key), entity)
+
+    def remove(self, category: str, key: str):
+        with self._lock:
+            self._entities.pop((category, key), None)
+            for token in self._documents.pop((category, key), {}):
+                postings = self._postings[token]
+                del postings[(category, key)]
+                if not postings:
+                    del self._postings[token]
+
+    def search(self, query: str, page: int=1, per_page: int=20) -> dict:
+        tokens = set(tokenize(query))
+        scores = Counter()
+        with self._lock:
+            total_documents = len(self._documents)
+            for token in tokens:
+                postings = self._postings.get(token, {})
+                if not postings:
+                    continue
+                idf = math.log(1 + total_documents / len(postings))
+                for key, count in postings.items():
+                    scores[key] += count / (count + 1.2) * idf
+            ranked = [(category, self._entities[(category, key)][0], score) for (category, key), score in scores.most_common()]
+        start = (page - 1) * per_page
+        return {
+            "total": len(ranked),
+            "page": page,
+            "per_page": per_page,
+            "hits": [{"category": category, "entity": name, "path": f"{category}/{name}", "score": score}
+                     for category, name, score in ranked[start:start + per_page]],
+        }
+
+
+def _apply_entity_writes(index: SearchIndex, collection_name: str, entities: list):
+    for entity in entities:
+        index.update(collection_name, entity)
+
+search_indexes = WorldIndex(lambda world_name, from_file: SearchIndex(world_entities(world_name, from_file)),
+                            apply=_apply_entity_writes)
+
+def mongo_search(world_name: str, query: str, page: int=1, per_page: int=20) -> Union[dict, None]:
+    """
+    Search a world with the ``$text`` indexes of its collections, see `schemas.indexes.TEXT_INDEXES`.
+
+    :return: None if the world does not exist.
+    """
+    world = db.collections["Worlds"].find_one({"WorldName": world_name})
+    if world is None:
+        return None
+    ids = {}
+    for field, value in world.items():
+        collection_name = utils.reference_collection(field)
+        if collection_name is not None:
+            ids.setdefault(collection_name, []).extend(value if isinstance(value, list) else [value])
+    hits = []
+    for collection_name, refs in ids.items():
+        cursor = db.collections[collection_name].find(
+            {"_id": {"$in": refs}, "$text": {"$search": query}},
+            {"name": 1, "score": {"$meta": "textScore"}},
+        )
+        for entity in cursor:
+            name = entity_name(entity, "")
+            hits.append({"category": collection_name, "entity": name, "path": f"{collection_name}/{name}", "score": entity["score"]})
+    hits.sort(key=lambda hit: hit["score"], reverse=True)
+    start = (page - 1) * per_page
+    return {"total": len(hits), "page": page, "per_page": per_page, "hits": hits[start:start + per_page]}
+
+def search_world(world_name: str, query: str, page: int=1, per_page: int=20, from_file: bool=False) -> Union[dict, None]:
+    """
+    Ranked search hits for a query in one world, or None if the world does not exist.
+
+    Uses the in-memory index unless SEARCH_BACKEND is "mongo", in which case database reads
+    are delegated to Mongo text indexes.
+    """
+    if not from_file and Config.SEARCH_BACKEND == "mongo":
+        return mongo_search(world_name, query, page, per_page)
+    index = search_indexes.get(world_name, from_file)
+    if index is None:
+        return None
+    return index.search(query, page, per_page)
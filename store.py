@@ -0,0 +1,60 @@
+import json
+import os
+import threading
+
+try:
+    import orjson
+except ImportError:  # orjson is optional, fall back to the standard library decoder
+    orjson = None
+
+
+def decode_json(raw: bytes) -> object:
+    """Parse JSON with orjson when it is installed, the json module otherwise."""
+    if orjson is not None:
+        return orjson.loads(raw)
+    return json.loads(raw)
+
+
+class WorldStore:
+    """
+    In-memory cache of parsed world files, keyed by path.
+
+    Each file is parsed once and revalidated on every read with a single ``os.stat``: the
+    cached data is reused as long as the file's mtime and size are unchanged. The returned
+    data is shared between callers and must be copied before it is modified.
+    """
+
+    def __init__(self):
+        self._files = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def load(self, file_path: str) -> object:
+        path = os.path.abspath(file_path)
+        stat = os.stat(path)
+        stamp = (stat.st_mtime_ns, stat.st_size)
+        entry = self._files.get(path)
+        if entry is not None and entry[0] == stamp:
+            self.hits += 1
+            return entry[1]
+        with open(path, 'rb') as file:
+            data = decode_json(file.read())
+        with self._lock:
+            self._files[path] = (stamp, data)
+            self.misses += 1
+        return data
+
+    def invalidate(self, file_path: str=None):
+        """Forget one file, or every file when no path is given."""
+        with self._lock:
+            if file_path is None:
+                self._files.clear()
+            else:
+                self._files.pop(os.path.abspath(file_path), None)
+
+    def stats(self) -> dict:
+        return {"files": len(self._files), "hits": self.hits, "misses": self.misses}
+
+
+world_store = WorldStore()
@@ -0,0 +1,85 @@
+from collections.abc import Iterator
+from typing import Callable, Union
+
+from flask import Response, current_app, stream_with_context
+
+from config import Config
+
+# ?stream= value -> mimetype of the streamed response
+STREAM_FORMATS = {
+    "ndjson": "application/x-ndjson",
+    "json":   "application/json",
+}
+
+
+def _is_sequence(value: object) -> bool:
+    return isinstance(value, (list, Iterator))
+
+def json_chunks(data: object, dumps: Callable) -> Iterator:
+    """
+    Serialize data as JSON piece by piece.
+
+    The top-level mapping is written key by key and every list or iterator in it (or the data
+    itself) element by element, so lazy reference iterators are only consumed as they are written.
+    """
+    if isinstance(data, dict):
+        yield "{"
+        for position, (key, value) in enumerate(data.items()):
+            yield ("," if position else "") + dumps(str(key)) + ":"
+            if _is_sequence(value):
+                yield from json_chunks(value, dumps)
+            else:
+                yield dumps(value)
+        yield "}"
+    elif _is_sequence(data):
+        yield "["
+        for position, item in enumerate(data):
+            yield ("," if position else "") + dumps(item)
+        yield "]"
+    else:
+        yield dumps(data)
+
+def ndjson_lines(data: object, dumps: Callable, key_name: str="name") -> Iterator:
+    """
+    Serialize data as newline delimited JSON, one line per object.
+
+    A list or iterator gives one line per element. A mapping gives one ``{key_name: key, "data": ...}``
+    line per value, or per element for values that are lists.
+    """
+    if isinstance(data, dict):
+        for key, value in data.items():
+            for item in (value if _is_sequence(value) else [value]):
+                yield dumps({key_name: key, "data": item}) + "\n"
+    elif _is_sequence(data):
+        for item in data:
+            yield dumps(item) + "\n"
+    else:
+        yield dumps(data) + "\n"
+
+def buffered(chunks: Iterator, size: Union[int, None]=None) -> Iterator:
+    """Join small chunks so the response is written in pieces of about ``size`` bytes."""
+    size = size or Config.STREAM_CHUNK_BYTES
+    buffer, length = [], 0
+    for chunk in chunks:
+        buffer.append(chunk)
+        length += len(chunk)
+        if length >= size:
+            yield "".join(buffer)
+            buffer, length = [], 0
+    if buffer:
+        yield "".join(buffer)
+
+def stream_response(data: object, stream_format: str, key_name: str="name") -> Response:
+    """
+    A streamed response writing data as NDJSON or as a JSON document, see `STREAM_FORMATS`.
+
+    :param data: The data to write; lists and iterators in it are written element by element.
+    :param stream_format: "ndjson" or "json".
+    :param key_name: Name of the key field of the NDJSON lines written for a mapping.
+    """
+    dumps = current_app.json.dumps
+    if stream_format == "ndjson":
+        chunks = ndjson_lines(data, dumps, key_name)
+    else:
+        chunks = json_chunks(data, dumps)
+    return Response(stream_with_context(buffered(chunks)), mimetype=STREAM_FORMATS[stream_format])
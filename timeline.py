@@ -0,0 +1,112 @@
+import re
+from typing import Union
+
+import utils
+from derived import WorldIndex
+
+# Period ranges are stored as strings such as "0 - 500"; a single year is also accepted
+PERIOD_RANGE = re.compile(r'^\s*(-?\d+)\s*(?:-\s*(-?\d+)\s*)?$')
+
+
+def parse_period(period: str) -> Union[tuple, None]:
+    """Parse a period range into (start, end) years, or None if it is not a range."""
+    match = PERIOD_RANGE.match(str(period))
+    if match is None:
+        return None
+    start = int(match.group(1))
+    end = int(match.group(2)) if match.group(2) is not None else start
+    return (start, end) if start <= end else (end, start)
+
+def world_eras(world_name: str, from_file: bool=False) -> dict:
+    """The eras of a world by name, from the history file or the Eras collection."""
+    data = utils.category_objects(world_name, "history" if from_file else "Eras", from_file) or {}
+    if isinstance(data, list):
+        data = {str(era.get("name", era.get("_id"))): era for era in data if isinstance(era, dict)}
+    return data
+
+
+class Timeline:
+    """
+    The periods of a world's history as numeric intervals, for point-in-time and range queries.
+
+    Periods are sorted by start year and form an implicit, balanced augmented interval tree:
+    the middle period of any slice is the root of the subtree over that slice, and
+    ``_max_end`` holds the latest end year in each subtree. A query skips every subtree that
+    ends before the range starts and every right subtree that starts after it ends, so it
+    costs O(log n) plus the periods it returns, however long some periods are.
+    """
+
+    def __init__(self, eras: dict):
+        periods = []
+        for era_name, era in eras.items():
+            for period_name, period in (era.get("Periods") or era.get("periods") or {}).items():
+                bounds = parse_period(period.get("period", period_name))
+                if bounds is not None:
+                    periods.append((bounds[0], bounds[1], era_name, period_name, period))
+        periods.sort(key=lambda period: (period[0], period[1]))
+        self._periods = periods
+        self._max_end = [0] * len(periods)
+        self._build(0, len(periods))
+
+    def _build(self, low: int, high: int) -> Union[int, None]:
+        """Fill in ``_max_end`` for the subtree over periods[low:high], returning its latest end."""
+        if low >= high:
+            return None
+        middle = (low + high) // 2
+        latest = self._periods[middle][1]
+        for child in (self._build(low, middle), self._build(middle + 1, high)):
+            if child is not None and child > latest:
+                latest = child
+        self._max_end[middle] = latest
+        return latest
+
+    def _overlapping(self, start: int, end: int) -> list:
+        found = []
+        self._collect(0, len(self._periods), start, end, found)
+        return found
+
+    def _collect(self, low: int, high: int, start: int, end: int, found: list):
+        """Append the periods of the subtree over periods[low:high] overlapping start-end, in order."""
+        if low >= high:
+            return
+        middle = (low + high) // 2
+        if self._max_end[middle] < start:
+            return
+        self._collect(low, middle, start, end, found)
+        period = self._periods[middle]
+        if period[0] > end:
+            return
+        if period[1] >= start:
+            found.append(period)
+        self._collect(middle + 1, high, start, end, found)
+
+    def at(self, year: int, faction: Union[str, None]=None) -> list:
+        """Every period that includes ``year``."""
+        return [self._describe(period, faction) for period in self._overlapping(year, year)]
+
+    def between(self, start: int, end: int, faction: Union[str, None]=None) -> list:
+        """Every period that overlaps the years ``start`` to ``end``, both included."""
+        return [self._describe(period, faction) for period in self._overlapping(start, end)]
+
+    @staticmethod
+    def _describe(period: tuple, faction: Union[str, None]) -> dict:
+        start, end, era_name, period_name, data = period
+        perspective = data.get("perspective") or {}
+        if faction is not None:
+            perspective = {name: text for name, text in perspective.items() if name == faction}
+        return {
+            "era": era_name,
+            "period": period_name,
+            "start": start,
+            "end": end,
+            "major_events": data.get("major_events", data.get("major events", [])),
+            "minor_events": data.get("minor_events", data.get("minor events", [])),
+            "perspective": perspective,
+        }
+
+
+timelines = WorldIndex(lambda world_name, from_file: Timeline(world_eras(world_name, from_file)))
+
+def world_timeline(world_name: str, from_file: bool=False) -> Union[Timeline, None]:
+    """The timeline of a world, or None if the world does not exist."""
+    return timelines.get(world_name, from_file)
@@ -1,11 +1,17 @@
 import os
 import json
 import re
+from datetime import datetime, timezone
 from typing import Union
 from apiflask import abort
 from flask import current_app, jsonify
 import db
-from pymongo import collection
+from cache import CachedValue, SingleFlight, world_cache
+from store import world_store
+from bundle import bundle_path, load_category, open_bundle
+from fieldsets import WORLD_SCHEMA_FIELDS, object_projection, select_paths
+from config import Config
+from pymongo import collection, InsertOne, ReturnDocument, UpdateOne
 from pymongo.results import UpdateResult 
 from bson import ObjectId
 
@@ -13,9 +19,8 @@ from bson import ObjectId
 #region JSON/File Functions
 
 def load_json(file_path: str):
-    """Load JSON data from a file."""
-    with open(file_path, 'r') as file:
-        return json.load(file)
+    """Load JSON data from a file, served from `store.world_store` while the file is unchanged."""
+    return world_store.load(file_path)
 
 def name_to_json(name: str) -> str:
     if  not name.endswith('.json'):
@@ -25,6 +30,7 @@ def dump_json(filepath: str, data: dict):
     filepath = name_to_json(filepath)
     with open(filepath, 'w') as file:
         json.dump(data, file, indent=current_app.config['JSON_INDENT'])
+    world_store.invalidate(filepath)
 def patch_dict(original: dict, patch: dict) -> dict:
     for key, value in patch.items():
         if isinstance(value, dict):
@@ -33,12 +39,74 @@ def patch_dict(original: dict, patch: dict) -> dict:
             original[key] = value
     return original
 
-def upsert_object(collection: collection, obj: dict) -> Union[ObjectId, None]:
+def compile_patch(patch: dict, prefix: str="") -> dict:
+    """
+    Compile a sparse, nested patch into MongoDB update operators on dotted paths.
+
+    Nested dicts are flattened so only the fields they name are written, ``None`` removes a
+    field with ``$unset`` and a ``"$push"`` key appends values (a list is pushed with
+    ``$each``) to the arrays it names. Everything else becomes a ``$set``.
+
+    :param patch: The patch to compile.
+    :param prefix: Dotted path the patch applies to.
+    :return: The update document to pass to ``update_one``.
+
+    Example:
+        >>> compile_patch({"traits": ["Wise"], "kingdom": None, "$push": {"goals": "Rule"}})
+        {'$set': {'traits': ['Wise']}, '$unset': {'kingdom': ''}, '$push': {'goals': 'Rule'}}
+    """
+    if not isinstance(patch, dict):
+        raise ValueError("A patch must be an object")
+    update = {}
+    for key, value in patch.items():
+        if key == "$push":
+            if not isinstance(value, dict):
+                raise ValueError("$push must be an object of fields to values")
+            for field, items in value.items():
+                items = {"$each": items} if isinstance(items, list) else items
+                update.setdefault("$push", {})[f"{prefix}{field}"] = items
+            continue
+        if key.startswith("$") or "." in key:
+            raise ValueError(f"Invalid field name in patch: {key}")
+        path = f"{prefix}{key}"
+        if isinstance(value, dict) and value:
+            for operator, fields in compile_patch(value, f"{path}.").items():
+                update.setdefault(operator, {}).update(fields)
+        elif value is None:
+            update.setdefault("$unset", {})[path] = ""
+        else:
+            update.setdefault("$set", {})[path] = value
+    return update
+
+def patch_object(collection: collection, obj_id: Union[ObjectId, str], patch: dict, world_id: Union[ObjectId, str, None]=None) -> UpdateResult:
+    """
+    Apply a sparse patch to an object, writing only the fields it touches.
+
+    :param collection: The MongoDB collection.
+    :param obj_id: The _id of the object to patch.
+    :param patch: The patch, see `compile_patch`.
+    :param world_id: The world the object belongs to. Its version is bumped so cached copies are invalidated.
+    :return: The result of the update.
+    """
+    update = compile_patch(patch)
+    if not update:
+        raise ValueError("Empty patch")
+    result = collection.update_one({'_id': ObjectId(obj_id)}, update)
+    if result.modified_count:
+        if world_id is not None:
+            bump_world_version(world_id, referencing_fields(collection.name))
+        notify_entity_listeners(collection.name, [ObjectId(obj_id)], world_id)
+    return result
+
+def upsert_object(collection: collection, obj: dict, world_id: Union[ObjectId, str, None]=None,
+                  notify: bool=True) -> Union[ObjectId, None]:
     """
     Insert or update an object in the specified collection.
 
     :param collection: The MongoDB collection.
     :param obj: The object to insert or update.
+    :param world_id: The world the object belongs to. Its version is bumped so cached copies are invalidated.
+    :param notify: Run the entity listeners; callers writing many objects notify them once instead.
     :return: The _id of the inserted or updated object.
     """
     if '_id' in obj and obj['_id']:
@@ -46,12 +114,17 @@ def upsert_object(collection: collection, obj: dict) -> Union[ObjectId, None]:
         del obj['_id']
         result = collection.update_one({'_id': ObjectId(obj_id)}, {'$set': obj}, upsert=True)
         if result.upserted_id is not None:
-            return result.upserted_id
+            obj_id = result.upserted_id
         else:
-            return ObjectId(obj_id)
+            obj_id = ObjectId(obj_id)
     else:
         result = collection.insert_one(obj)
-        return result.inserted_id
+        obj_id = result.inserted_id
+    if world_id is not None:
+        bump_world_version(world_id, referencing_fields(collection.name))
+    if notify:
+        notify_entity_listeners(collection.name, [obj_id], world_id)
+    return obj_id
     
 def to_ObjectId(obj: Union[ObjectId, str]) -> Union[ObjectId, None]:
     objectid_pattern = re.compile(r'^[0-9a-fA-F]{24}$')
@@ -60,10 +133,7 @@ def to_ObjectId(obj: Union[ObjectId, str]) -> Union[ObjectId, None]:
     elif re.match(objectid_pattern, obj):
         return ObjectId(obj)
     else:
-        world = db.collections["Worlds"].find_one({"WorldName": obj})
-        if world is not None:
-            return world["_id"]
-        return None
+        return world_object_id(obj)
 
 def is_iterable(var: object) -> bool:
     try:
@@ -75,27 +145,187 @@ def is_iterable(var: object) -> bool:
 
 #region World Functions
 
+# World reference fields that point into a collection with a different name
+REFERENCE_COLLECTIONS = {
+    "Kingdoms": "Groups",
+    "Factions": "Groups",
+    "MagicSystems": "Magic",
+    "Pantheon": "Gods",
+}
+
+# Per-world counter on the Worlds document, incremented on every write to the world
+VERSION_FIELD = "_version"
+# Time of the last write to a world, set together with VERSION_FIELD
+MODIFIED_FIELD = "_modified"
+# Per-field counters of the writes to each category of a world; ALL_CATEGORIES counts the
+# writes that may have touched any of them
+CATEGORY_VERSIONS_FIELD = "_versions"
+ALL_CATEGORIES = "_all"
+# Bookkeeping fields of the Worlds documents that are not world data
+BOOKKEEPING_FIELDS = (VERSION_FIELD, MODIFIED_FIELD, CATEGORY_VERSIONS_FIELD)
+
+def version_bump(fields: Union[list, None]=None) -> dict:
+    """
+    The update applied to a world document on every write to the world.
+
+    :param fields: The world fields the write touched, None if it could have touched any.
+    """
+    increments = {VERSION_FIELD: 1}
+    for field in (fields if fields is not None else [ALL_CATEGORIES]):
+        increments[f"{CATEGORY_VERSIONS_FIELD}.{field}"] = 1
+    return {"$inc": increments, "$currentDate": {MODIFIED_FIELD: True}}
+
+def referencing_fields(collection_name: str) -> list:
+    """The world fields whose references point into a collection."""
+    return [field for field, target in REFERENCE_COLLECTIONS.items() if target == collection_name] or [collection_name]
+
+def _load_world_names() -> list:
+    return [world["WorldName"] for world in db.collections['Worlds'].find({}, {"WorldName": 1, "_id": 0})]
+
+# Names of every world, refreshed whenever a world is created, renamed or deleted in this
+# process and every WORLD_LIST_CACHE_TTL seconds to pick up changes from other workers
+world_names = CachedValue(_load_world_names, Config.WORLD_LIST_CACHE_TTL)
+
 def worlds(from_file: bool=False) -> list:
     if from_file:
         return os.listdir(current_app.config['WORLDS_DIR'])
-    return [world["WorldName"] for world in db.collections['Worlds'].find()]
+    return list(world_names.get())
+
+def world_version(world_name: str, from_file: bool=False) -> Union[int, tuple, None]:
+    """
+    Current version of a world, or None if it does not exist.
+
+    In file mode the version is (newest mtime, bundle size): the newest mtime of the world's
+    category files, and of its bundle when reads come from one (see `_uses_bundle`), so that
+    rebuilding a bundle changes the version even if its mtime does not.
+    """
+    if from_file:
+        if not world_exists(world_name, from_file):
+            return None
+        newest = max((os.stat(os.path.join(world_path(world_name), category)).st_mtime_ns
+                      for category in world_categories(world_name, from_file)), default=0)
+        if not _uses_bundle(world_name):
+            return newest, 0
+        bundle = os.stat(bundle_path(world_name))
+        return max(newest, bundle.st_mtime_ns), bundle.st_size
+    world = db.collections["Worlds"].find_one({"WorldName": world_name}, {VERSION_FIELD: 1})
+    if world is None:
+        return None
+    return world.get(VERSION_FIELD, 0)
+
+def world_stamp(world_name: str, from_file: bool=False) -> Union[tuple, None]:
+    """
+    A tag identifying the current content of a world and the time it was last written, or None
+    if the world does not exist. Costs one projected ``find_one``, or a stat per category file
+    and of the world's bundle.
+
+    :return: (tag, last modified datetime in UTC or None if the world was never written)
+    """
+    if from_file:
+        version = world_version(world_name, from_file)
+        if version is None:
+            return None
+        modified, bundle_size = version
+        return f"f{modified}-{bundle_size}", datetime.fromtimestamp(modified / 1e9, timezone.utc)
+    world = db.collections["Worlds"].find_one({"WorldName": world_name}, {VERSION_FIELD: 1, MODIFIED_FIELD: 1})
+    if world is None:
+        return None
+    modified = world.get(MODIFIED_FIELD)
+    if modified is not None and modified.tzinfo is None:
+        modified = modified.replace(tzinfo=timezone.utc)
+    # The _id keeps tags apart when a world is deleted and created again
+    return f"{world['_id']}-{world.get(VERSION_FIELD, 0)}", modified
+
+def bump_world_version(world: Union[ObjectId, str], fields: Union[list, None]=None) -> UpdateResult:
+    """
+    Increment the version of a world so every worker stops serving its cached data.
+
+    Cache entries are keyed by version, so stale entries are never read again. When the world
+    is given by name they are also dropped from this process right away; otherwise they age
+    out of the cache.
+
+    :param fields: The world fields that were written, whose category versions are bumped too.
+        None bumps them all.
+    """
+    obj_id = _as_object_id(world)
+    query = {"_id": obj_id} if obj_id is not None else {"WorldName": world}
+    result = db.collections["Worlds"].update_one(query, version_bump(fields))
+    if obj_id is None:
+        invalidate_world(world)
+    return result
+
+def category_versions(world: dict, fields: list) -> tuple:
+    """
+    The versions of some categories of a world document, changing whenever one of them is written.
+    """
+    versions = world.get(CATEGORY_VERSIONS_FIELD, {})
+    return (world["_id"], versions.get(ALL_CATEGORIES, 0), *(versions.get(field, 0) for field in fields))
+
+def invalidate_world(world_name: str):
+    """Drop this process's cached data for a world."""
+    world_cache.invalidate(lambda key: len(key) > 1 and key[1] == world_name)
+
+def _load_lease(key: tuple):
+    # Load keys start with (kind, world name, version)
+    return db.lease(f"{key[0]}:{key[1]}:{key[2]}", Config.WORLD_LOAD_LEASE_SECONDS)
+
+# Concurrent loads of the same world data share one computation, see `SingleFlight`
+world_loads = SingleFlight(lease=_load_lease if Config.WORLD_LOAD_LEASE_SECONDS else None)
+
+def cache_stats() -> dict:
+    return {**world_cache.stats(), "single_flight": world_loads.stats()}
     
+def _load_world_ids() -> dict:
+    return {world["WorldName"]: world["_id"] for world in db.collections["Worlds"].find({}, {"WorldName": 1})}
+
+# WorldName -> _id of every world, shared by all lookups. Writes in this process keep it up to
+# date, and it is reloaded every WORLD_LIST_CACHE_TTL seconds to pick up renames and deletes by
+# other workers
+_world_ids = CachedValue(_load_world_ids, Config.WORLD_LIST_CACHE_TTL)
+
+def world_object_id(world_name: str) -> Union[ObjectId, None]:
+    """
+    Look up the _id of a world by name.
+
+    Names are served from an in-process map. A miss costs one projected ``find_one`` on the
+    unique WorldName index and is remembered; writes keep the map up to date.
+    """
+    world_ids = _world_ids.get()
+    obj_id = world_ids.get(world_name)
+    if obj_id is None:
+        world = db.collections["Worlds"].find_one({"WorldName": world_name}, {"_id": 1})
+        if world is None:
+            return None
+        obj_id = world_ids[world_name] = world["_id"]
+    return obj_id
+
+def forget_world(world_name: str):
+    """Drop a world that turned out not to exist any more, e.g. renamed by another worker, from this process."""
+    _world_ids.get().pop(world_name, None)
+    invalidate_world(world_name)
+    world_names.invalidate()
+
+def refresh_world_ids():
+    """Reload the WorldName -> _id map from the Worlds collection on next use."""
+    _world_ids.invalidate()
+
 def world_exists(world_name: str, from_file: bool=False) -> bool:
-    if from_file and world_name in worlds():
-        return True
-    return not from_file and world_name in worlds()
+    if from_file:
+        return os.path.isdir(world_path(world_name))
+    return world_object_id(world_name) is not None
 
 def world_path(world_name: str) -> str:
-    if world_exists(world_name):
-        return os.path.join(current_app.config['WORLDS_DIR'], f"{world_name}")
+    return os.path.join(current_app.config['WORLDS_DIR'], f"{world_name}")
     
-def world_data(world_name: str, from_file: bool=False) -> dict:
+def world_data(world_name: str, from_file: bool=False, fields: Union[dict, None]=None, include: Union[set, None]=None) -> dict:
     """
     Retrieves the data for a given world.
 
     Args:
         world_name (str): The name of the world to retrieve the data for.
         from_file (bool, optional): Whether to retrieve the data from a file or from the database. Defaults to False.
+        fields (dict, optional): Sparse fieldset from `fieldsets.parse_fields`. Only these fields are read and returned. Defaults to every field.
+        include (set, optional): World document fields from `fieldsets.parse_include` whose references are resolved; the others are returned as ids. Defaults to every reference.
 
     Returns:
         dict: A dictionary containing the data of the specified world.
@@ -104,25 +334,192 @@ def world_data(world_name: str, from_file: bool=False) -> dict:
         None
 
     Description:
-        This function retrieves the data for a given world. It first checks if the world exists using the `world_exists` function. If the world exists, it checks if the data should be retrieved from a file or from the database. If the data should be retrieved from a file, it loads the data from a JSON file using the `load_json` function. If the data should be retrieved from the database, it retrieves the data from the "Worlds" collection in the database using the `find_one` method. It then iterates over the categories in the world data and retrieves the corresponding category data using the `category_data_by_id` function. Finally, it replaces the category IDs in the world data with the full category data and returns the world data.
+        This function retrieves the data for a given world. It first checks if the world exists using the `world_exists` function. If the world exists, it checks if the data should be retrieved from a file or from the database. If the data should be retrieved from a file, it loads the data from a JSON file using the `load_json` function, or assembles it from the world's category files when there is no single world file. If the data should be retrieved from the database, it retrieves the data from the "Worlds" collection in the database using the `find_one` method, projected to the requested fields. It then resolves every requested category reference in the world document with `resolve_references`, which fetches the referenced objects with one query per collection, and returns the world data. Resolved worlds are cached per world version and selection, so repeat reads only cost a version lookup.
     """
     if from_file:
-        return load_json(f"{world_path(world_name)}/{name_to_json(world_name)}")
+        world_file = f"{world_path(world_name)}/{name_to_json(world_name)}"
+        if os.path.exists(world_file):
+            world = load_json(world_file)
+        else:
+            categories = [category for category in world_categories(world_name, from_file)
+                          if fields is None or category[:-len('.json')] in fields]
+            world = {category[:-len('.json')]: load_json(f"{world_path(world_name)}/{category}")
+                     for category in categories}
+        if fields is not None:
+            world = {top: select_paths(top, world[top], paths) for top, paths in fields.items() if top in world}
+        return world
     
-    world = db.collections["Worlds"].find_one({"WorldName": world_name})
-    for category in world.keys():
-        if is_iterable(world[category]):
-            if isinstance(world[category], dict):
-                full_category = category_data_by_id(world[category])
-            elif isinstance(world[category], list):
-                full_category = [category_data_by_id(item) for item in world[category]]
-            else:
-                raise ValueError("Invalid type for category: {}".format(type(world[category])))
+    version = world_version(world_name)
+    if version is None:
+        forget_world(world_name)
+        abort(404, f'World {world_name} not found')
+    selection = (tuple(sorted((top, tuple(sorted(paths))) for top, paths in fields.items())) if fields is not None else None,
+                 tuple(sorted(include)) if include is not None else None)
+    key = ("world_data", world_name, version, selection)
+    def load() -> dict:
+        world = world_cache.get(key)
+        if world is None and fields is None and include is None:
+            for reader in world_readers:
+                world = reader(world_name, version)
+                if world is not None:
+                    world_cache.set(key, world)
+                    break
+        if world is None:
+            projection, object_projections = world_projection(fields)
+            world = db.collections["Worlds"].find_one({"WorldName": world_name}, projection)
+            if world is None:
+                forget_world(world_name)
+                abort(404, f'World {world_name} not found')
+            for field in BOOKKEEPING_FIELDS:
+                world.pop(field, None)
+            world = resolve_references(world, object_projections, include)
+            world_cache.set(key, world)
+        return world
+
+    world = world_cache.get(key)
+    if world is None:
+        # A full read may come from a stored result (e.g. a WorldView) the lease holder leaves behind
+        world = world_loads.do(key, load, shared=bool(world_readers) and fields is None and include is None)
+    return dict(world)
+
+def world_projection(fields: Union[dict, None]) -> tuple:
+    """
+    The Mongo projections needed to read a sparse fieldset of a world.
+
+    :param fields: Sparse fieldset from `fieldsets.parse_fields`, None for every field.
+    :return: The projection on the world document and, per world document field, the projection
+        on the objects it references.
+    """
+    if fields is None:
+        return None, {}
+    projection = {"WorldName": 1}
+    object_projections = {}
+    for top, paths in fields.items():
+        for document_field in WORLD_SCHEMA_FIELDS[top][0]:
+            projection[document_field] = 1
+            object_projections[document_field] = object_projection(top, paths)
+    return projection, object_projections
+
+def iter_references(collection_name: str, refs: list, projection: Union[dict, None]=None, batch_size: Union[int, None]=None):
+    """
+    Yield the objects a list of references points to, in order, fetching one batch at a time.
+
+    Only one batch of objects is held in memory, so a reference list can be streamed without
+    materializing it. Like `resolve_references`, references that cannot be found yield an
+    empty string and values that are not ids are yielded as they are.
+    """
+    collection = db.collections[collection_name]
+    batch_size = batch_size or Config.STREAM_BATCH_SIZE
+    for start in range(0, len(refs), batch_size):
+        batch = refs[start:start + batch_size]
+        ids = [_as_object_id(ref) for ref in batch]
+        cursor = collection.find({"_id": {"$in": [obj_id for obj_id in ids if obj_id is not None]}}, projection)
+        found = {obj["_id"]: obj for obj in cursor.batch_size(batch_size)}
+        for ref, obj_id in zip(batch, ids):
+            yield ref if obj_id is None else found.get(obj_id, "")
+
+def iter_world(world_name: str, from_file: bool=False, fields: Union[dict, None]=None, include: Union[set, None]=None) -> dict:
+    """
+    Like `world_data`, but every resolved reference list is a lazy iterator over its objects.
+
+    Used to stream a world: the world document is read up front and the referenced objects are
+    fetched batch by batch while the response is written. File-backed worlds are read whole.
+    """
+    if from_file:
+        return world_data(world_name, from_file, fields, include)
+    projection, object_projections = world_projection(fields)
+    world = db.collections["Worlds"].find_one({"WorldName": world_name}, projection)
+    if world is None:
+        forget_world(world_name)
+        abort(404, f'World {world_name} not found')
+    for field in BOOKKEEPING_FIELDS:
+        world.pop(field, None)
+    streamed = {}
+    for field, value in world.items():
+        collection_name = reference_collection(field)
+        if collection_name is None or (include is not None and field not in include):
+            streamed[field] = value
+        elif isinstance(value, list):
+            streamed[field] = iter_references(collection_name, value, object_projections.get(field))
         else:
-            full_category = category_data_by_id(world[category])
-        world[category] = full_category
-            
-    return world
+            streamed[field] = next(iter_references(collection_name, [value], object_projections.get(field)))
+    return streamed
+
+def reference_collection(field: str) -> Union[str, None]:
+    """Name of the collection a world field references, or None if the field holds plain data."""
+    if field in ("_id", "WorldName", *BOOKKEEPING_FIELDS):
+        return None
+    collection_name = REFERENCE_COLLECTIONS.get(field, field)
+    return collection_name if collection_name in db.collections else None
+
+def _as_list(value: object) -> list:
+    if value is None:
+        return []
+    return value if isinstance(value, list) else [value]
+
+def _as_object_id(ref: object) -> Union[ObjectId, None]:
+    if isinstance(ref, ObjectId):
+        return ref
+    if isinstance(ref, str) and ObjectId.is_valid(ref):
+        return ObjectId(ref)
+    return None
+
+def resolve_references(world: dict, projections: Union[dict, None]=None, include: Union[set, None]=None) -> dict:
+    """
+    Replace the ObjectId references of a world document with the objects they point to.
+
+    Every referenced id is gathered first, grouped by target collection, and fetched with a
+    single ``$in`` query per collection, so the number of round trips depends on the number
+    of categories rather than the number of objects. References that cannot be found are
+    replaced with an empty string and fields that are not references are left untouched.
+
+    :param world: The world document as stored in the Worlds collection.
+    :param projections: Mongo projection to fetch the objects of each world field with. Fields
+        without one are fetched whole.
+    :param include: The world fields to resolve. The others keep their ids. Defaults to all.
+    :return: The world document with its references resolved.
+    """
+    projections = projections or {}
+    wanted = {}
+    fetch_projections = {}
+    for field, value in world.items():
+        collection_name = reference_collection(field)
+        if collection_name is None or (include is not None and field not in include):
+            continue
+        refs = value if isinstance(value, list) else [value]
+        ids = wanted.setdefault(collection_name, set())
+        ids.update(obj_id for obj_id in map(_as_object_id, refs) if obj_id is not None)
+        projection = projections.get(field)
+        if collection_name in fetch_projections:
+            current = fetch_projections[collection_name]
+            fetch_projections[collection_name] = None if current is None or projection is None else {**current, **projection}
+        else:
+            fetch_projections[collection_name] = projection
+
+    found = {}
+    for collection_name, ids in wanted.items():
+        if ids:
+            cursor = db.collections[collection_name].find({"_id": {"$in": list(ids)}}, fetch_projections[collection_name])
+            found[collection_name] = {obj["_id"]: obj for obj in cursor}
+
+    def resolve(ref, objects: dict):
+        obj_id = _as_object_id(ref)
+        if obj_id is None:
+            return ref
+        return objects.get(obj_id, "")
+
+    resolved = {}
+    for field, value in world.items():
+        collection_name = reference_collection(field)
+        if collection_name is None or (include is not None and field not in include):
+            resolved[field] = value
+            continue
+        objects = found.get(collection_name, {})
+        if isinstance(value, list):
+            resolved[field] = [resolve(ref, objects) for ref in value]
+        else:
+            resolved[field] = resolve(value, objects)
+    return resolved
 
 def build_world_data(obj_id: Union[ObjectId, str], data: Union[dict, str, ObjectId, list]) -> object:
     obj_id = to_ObjectId(obj_id)
@@ -130,20 +527,87 @@ def build_world_data(obj_id: Union[ObjectId, str], data: Union[dict, str, Object
     #@TODO Rework to recursively build a world json object
     
                 
+def world_document(world_name: str, fields: Union[dict, None]=None) -> dict:
+    """A new world document, named and stamped the way every writer stores it."""
+    return {**(fields or {}), "WorldName": world_name, MODIFIED_FIELD: datetime.now(timezone.utc)}
+
+def create_world(world_name: str, fields: Union[dict, None]=None) -> ObjectId:
+    """Insert a new world document and return its _id."""
+    result = db.collections["Worlds"].insert_one(world_document(world_name, fields))
+    _world_ids.get()[world_name] = result.inserted_id
+    world_names.invalidate()
+    return result.inserted_id
+
+def delete_world(world_name: str) -> bool:
+    """Delete a world document. The objects it references are left in place."""
+    world = db.collections["Worlds"].find_one_and_delete({"WorldName": world_name}, {"_id": 1})
+    _world_ids.get().pop(world_name, None)
+    invalidate_world(world_name)
+    world_names.invalidate()
+    if world is None:
+        return False
+    notify_world_listeners(world["_id"], None)
+    return True
+
 def dump_world_data(world_name: str, data: dict):
     if world_exists(world_name):
-        for category in data.values():
-            dump_category_data(world_name, category)
+        for category, category_data in data.items():
+            dump_category_data(world_name, category, category_data)
+        bump_world_version(world_name)
     
-def update_world_reference(world_id: Union[ObjectId, str], update_fields: dict) -> UpdateResult:   
+def bulk_operation(obj: dict) -> tuple:
+    """
+    Build the bulk write operation that upserts an object, generating its _id client side.
+
+    :param obj: The object to insert or update. It is not modified.
+    :return: The _id of the object and the operation to pass to ``bulk_write``.
+    """
+    obj = dict(obj)
+    obj_id = _as_object_id(obj.pop('_id', None))
+    if obj_id is None:
+        obj_id = ObjectId()
+        return obj_id, InsertOne({'_id': obj_id, **obj})
+    return obj_id, UpdateOne({'_id': obj_id}, {'$set': obj}, upsert=True)
+
+# Callbacks run after update_world_reference has written objects, as listener(world _id,
+# collection name, written objects with their _id, ids the world referenced in the written
+# fields before and no longer does, version of the world the write produced). A write to
+# several collections calls each listener once per collection with the same version.
+write_listeners = []
+# Callbacks run after objects have been written to a collection by any of the functions above,
+# as listener(collection name, _ids of the objects, _id of the world whose version the writer
+# bumps itself or None)
+entity_listeners = []
+# Callbacks run after fields of a world document have been written, as listener(world _id,
+# names of the fields); None for the fields means the world was deleted
+world_listeners = []
+# Alternative sources of fully resolved worlds, tried in order before the references are
+# resolved, as reader(world name, version) returning the world or None (see views.py)
+world_readers = []
+
+def notify_entity_listeners(collection_name: str, ids: list, world_id: Union[ObjectId, str, None]=None):
+    if not entity_listeners:
+        return
+    world_id = to_ObjectId(world_id) if world_id is not None else None
+    for listener in entity_listeners:
+        listener(collection_name, ids, world_id)
+
+def notify_world_listeners(world_id: ObjectId, fields: Union[list, None]):
+    for listener in world_listeners:
+        listener(world_id, fields)
+
+def update_world_reference(world_id: Union[ObjectId, str], update_fields: dict, bulk: bool=False) -> Union[UpdateResult, dict]:   
     """_summary_
 
     Args:
         world_id (Union[ObjectId, str]): _description_
         update_fields (dict): _description_
+        bulk (bool, optional): Write all objects with one unordered ``bulk_write`` per target collection
+            instead of one round trip per object. Defaults to False.
 
     Returns:
         UpdateResult: Includes the number of documents matched, modified, and upserted.
+        dict: In bulk mode, the matched, modified and upserted counts per collection, including Worlds.
         
     Example:
         >>> update_fields = {
@@ -174,25 +638,79 @@ def update_world_reference(world_id: Union[ObjectId, str], update_fields: dict)
         >>> update_world_reference("world1", update_fields)
         >>> update_world_reference("60c72b2f9af1c88a4a4c6a5b", update_fields)
     """
+    world_name = None
     if world_exists(world_id, False):
-        world_id = db.collections["Worlds"].find_one({"WorldName": world_id})["_id"]
+        world_name = world_id
         
     world_id = to_ObjectId(world_id)
         
     update_data = {}
+    operations = {}
+    written = {}
+    replaced = {}
     for field, value in update_fields.items():
-        if field in db.collections:
-            if isinstance(value, list):
-                update_ids = [upsert_object(db.collections[field], obj) for obj in value]
-                update_data[field] = update_ids
-            else:
-                updated_id = upsert_object(db.collections[field], value)
-                update_data[field] = updated_id
-        else:
+        collection_name = reference_collection(field)
+        if collection_name is None:
             update_data[field] = value
+            continue
+        replaced.setdefault(collection_name, []).append(field)
+        objects = value if isinstance(value, list) else [value]
+        update_ids = []
+        for obj in objects:
+            if bulk:
+                obj_id, operation = bulk_operation(obj)
+                operations.setdefault(collection_name, []).append(operation)
+            else:
+                obj_id = upsert_object(db.collections[collection_name], obj, notify=False)
+            update_ids.append(obj_id)
+            written.setdefault(collection_name, []).append({**obj, '_id': obj_id})
+        update_data[field] = update_ids if isinstance(value, list) else update_ids[0]
+
+    # The reference fields are replaced whole, so listeners are told which objects they lose
+    previous = {}
+    if write_listeners and replaced:
+        previous = db.collections["Worlds"].find_one(
+            {"_id": world_id}, {field: 1 for fields in replaced.values() for field in fields}) or {}
+
+    counts = {}
+    for collection_name, pending in operations.items():
+        bulk_result = db.collections[collection_name].bulk_write(pending, ordered=False)
+        counts[collection_name] = {
+            "matched": bulk_result.matched_count,
+            "modified": bulk_result.modified_count,
+            "upserted": bulk_result.upserted_count + bulk_result.inserted_count,
+        }
             
-    result = db.collections["Worlds"].update_one({"_id": world_id}, {"$set": update_data})    
+    # Once per collection, whether its objects were written in bulk or one at a time
+    for collection_name, objects in written.items():
+        notify_entity_listeners(collection_name, [obj['_id'] for obj in objects], world_id)
+
+    # Read back the version this write produced, listeners keep their structures in step with it
+    world = db.collections["Worlds"].find_one_and_update({"_id": world_id}, {"$set": update_data, **version_bump(list(update_fields))},
+                                                         {VERSION_FIELD: 1}, return_document=ReturnDocument.AFTER)
+    matched = int(world is not None)
+    result = UpdateResult({"n": matched, "nModified": matched, "ok": 1}, acknowledged=True)
+    if world_name is not None:
+        invalidate_world(world_name)
+    if "WorldName" in update_fields:
+        world_ids = _world_ids.get()
+        for name in [name for name, obj_id in world_ids.items() if obj_id == world_id]:
+            invalidate_world(name)
+            del world_ids[name]
+        world_ids[update_fields["WorldName"]] = world_id
+        world_names.invalidate()
+    for collection_name, fields in replaced.items():
+        objects = written.get(collection_name, [])
+        kept = {obj['_id'] for obj in objects}
+        removed = [obj_id for field in fields for obj_id in map(_as_object_id, _as_list(previous.get(field)))
+                   if obj_id is not None and obj_id not in kept]
+        for listener in write_listeners:
+            listener(world_id, collection_name, objects, removed, world.get(VERSION_FIELD, 0) if world is not None else None)
+    notify_world_listeners(world_id, list(update_fields))
     
+    if bulk:
+        counts["Worlds"] = {"matched": result.matched_count, "modified": result.modified_count, "upserted": 0}
+        return counts
     return result
 
 #endregion World Functions
@@ -200,9 +718,17 @@ def update_world_reference(world_id: Union[ObjectId, str], update_fields: dict)
 #region Category Functions
 
 def category_exists(world_name: str, category_name: str, from_file: bool=False) -> bool:
-    return world_exists(world_name, from_file) and \
-        (os.path.exists(f"{world_path(world_name)}/{name_to_json(category_name)}") or \
-            category_name in world_categories(world_name, from_file))
+    if not world_exists(world_name, from_file):
+        return False
+    if from_file:
+        if _uses_bundle(world_name):
+            return category_name in open_bundle(bundle_path(world_name)).categories
+        return os.path.exists(f"{world_path(world_name)}/{name_to_json(category_name)}")
+    return reference_collection(category_name) is not None
+
+def _uses_bundle(world_name: str) -> bool:
+    """Whether file-mode reads of a world's categories come from its bundle, see USE_WORLD_BUNDLES."""
+    return current_app.config['USE_WORLD_BUNDLES'] and os.path.exists(bundle_path(world_name))
 
 def world_categories(world_name: str, from_file: bool=False) -> list:
     if world_exists(world_name, from_file):
@@ -210,14 +736,56 @@ def world_categories(world_name: str, from_file: bool=False) -> list:
             return [category for category in os.listdir(world_path(world_name)) if category.endswith('.json')]
         return list(db.collections.keys())
 
+def category_objects(world_name: str, category_name: str, from_file: bool=False) -> Union[dict, list, None]:
+    """The data of one category of a world, or None if the category does not exist."""
+    if not category_exists(world_name, category_name, from_file):
+        return None
+    if from_file:
+        if _uses_bundle(world_name):
+            return load_category(bundle_path(world_name), category_name)
+        return load_json(f"{world_path(world_name)}/{name_to_json(category_name)}")
+    version = world_version(world_name)
+    key = ("category_data", world_name, category_name, version)
+    def load() -> Union[dict, list]:
+        data = world_cache.get(key)
+        if data is None:
+            world = db.collections["Worlds"].find_one({"WorldName": world_name}, {category_name: 1})
+            if world is None:
+                forget_world(world_name)
+                abort(404, f'World {world_name} not found')
+            data = resolve_references(world).get(category_name, [])
+            world_cache.set(key, data)
+        return data
+
+    data = world_cache.get(key)
+    if data is None:
+        data = world_loads.do(key, load)
+    return data
+
+def iter_category(world_name: str, category_name: str, from_file: bool=False) -> Union[dict, list, None]:
+    """
+    Like `category_objects`, but a reference list is a lazy iterator over its objects.
+
+    :return: The category data, or None if the category does not exist.
+    """
+    if not category_exists(world_name, category_name, from_file):
+        return None
+    if from_file:
+        return category_objects(world_name, category_name, from_file)
+    world = db.collections["Worlds"].find_one({"WorldName": world_name}, {category_name: 1})
+    if world is None:
+        forget_world(world_name)
+        abort(404, f'World {world_name} not found')
+    refs = world.get(category_name, [])
+    collection_name = reference_collection(category_name)
+    if isinstance(refs, list):
+        return iter_references(collection_name, refs)
+    return next(iter_references(collection_name, [refs]))
+
 def category_data(world_name: str, category_name: str, from_file: bool=False) -> dict:
-    if world_exists(world_name, from_file) and category_exists(world_name, category_name, from_file):
-        if from_file:
-            return load_json(f"{world_path(world_name)}/{name_to_json(category_name)}")
-        else:
-            data_ids = db.collections["Worlds"].find_one("WorldName", world_name)[category_name]
-            data = db.collections[category_name].find({"_id": {"$in": data_ids}})
-            return jsonify(data)
+    data = category_objects(world_name, category_name, from_file)
+    if data is not None:
+        return data if from_file else jsonify(data)
         
 def category_data_by_id(category_id: Union[ObjectId, str]) -> Union[dict, str]:
     obj_id = to_ObjectId(category_id)
@@ -228,7 +796,7 @@ def category_data_by_id(category_id: Union[ObjectId, str]) -> Union[dict, str]:
     return ""
 
 def dump_category_data(world_name: str, category_name: str, data: dict):
-    dump_json(os.path.join(world_path(world_name), category_name, data))
+    dump_json(os.path.join(world_path(world_name), category_name), data)
 
 #endregion Category Functions
 
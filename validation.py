@@ -0,0 +1,114 @@
+from functools import lru_cache
+from typing import Annotated, Any, Dict as DictType, List as ListType, Literal, Union
+
+from apiflask.fields import Dict, Integer, List, Nested, String
+from marshmallow import INCLUDE, RAISE, ValidationError
+from marshmallow.exceptions import RegistryError
+from marshmallow.validate import OneOf
+from pydantic import BeforeValidator, ConfigDict, TypeAdapter, create_model
+from pydantic import ValidationError as PydanticValidationError
+
+from config import Config
+
+
+#region Schema instances
+
+def schema_class(name: str) -> type:
+    schema_class = Config.SCHEMA_CLASSES.get(name)
+    if schema_class is None:
+        raise KeyError(f"No schema named {name}")
+    return schema_class
+
+@lru_cache(maxsize=None)
+def schema(name: str, many: bool=False, unknown: str=RAISE) -> object:
+    """
+    The shared instance of a schema from SCHEMA_CLASSES.
+
+    Building a schema binds and copies every declared field, so instances are built once per
+    name and variant and reused; loading does not modify them.
+    """
+    return schema_class(name)(many=many, unknown=unknown)
+
+#endregion Schema instances
+
+#region Compiled models
+
+def _not_bool(value: Any) -> Any:
+    # marshmallow's Integer rejects booleans, pydantic's int would take them as 0 and 1
+    if isinstance(value, bool):
+        raise ValueError("Not a valid integer.")
+    return value
+
+def _field_type(field) -> Any:
+    """The pydantic type equivalent to a marshmallow field."""
+    if isinstance(field, Nested):
+        try:
+            return model(type(field.schema).__name__)
+        except RegistryError:
+            # marshmallow only fails on an unresolvable nested schema once data reaches it
+            return Any
+    if isinstance(field, List):
+        return ListType[_field_type(field.inner)]
+    if isinstance(field, Dict):
+        return DictType[str, _field_type(field.value_field) if field.value_field is not None else Any]
+    if isinstance(field, String):
+        choices = [validator.choices for validator in field.validators if isinstance(validator, OneOf)]
+        return Literal[tuple(choices[0])] if choices else str
+    if isinstance(field, Integer):
+        return Annotated[int, BeforeValidator(_not_bool)]
+    return Any
+
+@lru_cache(maxsize=None)
+def model(name: str, allow_extra: bool=False) -> type:
+    """
+    A pydantic model generated from a marshmallow schema, validated in compiled code.
+
+    Fields keep the meaning they have in the schema: optional unless ``required``, and null
+    only when ``allow_none``. Unknown keys are kept with ``allow_extra`` and rejected otherwise,
+    as marshmallow does for the top level (``unknown=INCLUDE``) and nested schemas respectively.
+    """
+    fields = {}
+    for field_name, field in schema(name).fields.items():
+        field_type = _field_type(field)
+        if field.allow_none:
+            field_type = Union[field_type, None]
+        fields[field.data_key or field_name] = (field_type, ... if field.required else None)
+    config = ConfigDict(extra='allow' if allow_extra else 'forbid')
+    return create_model(f"{name}Model", __config__=config, **fields)
+
+@lru_cache(maxsize=None)
+def _adapter(name: str) -> TypeAdapter:
+    return TypeAdapter(ListType[model(name, allow_extra=True)])
+
+def _messages(error: PydanticValidationError) -> dict:
+    """The errors of a pydantic validation in marshmallow's nested message format."""
+    messages = {}
+    for detail in error.errors():
+        *path, last = detail['loc'] or ('_schema',)
+        node = messages
+        for key in path:
+            node = node.setdefault(key, {})
+        node.setdefault(last, []).append(detail['msg'])
+    return messages
+
+#endregion Compiled models
+
+def load(name: str, data: Union[dict, list], many: bool=False, fast: bool=False) -> Union[dict, list]:
+    """
+    Validate data against a schema, keeping the fields the schema does not declare.
+
+    :param name: The schema name in SCHEMA_CLASSES.
+    :param data: An object, or a list of objects with ``many``.
+    :param fast: Validate with the compiled pydantic model of the schema instead of marshmallow.
+        Meant for bulk payloads; the result is the same.
+    :raises marshmallow.ValidationError: On invalid data, with marshmallow style messages either way.
+    """
+    if not fast:
+        return schema(name, many, INCLUDE).load(data)
+    try:
+        objects = _adapter(name).validate_python(data if many else [data])
+    except PydanticValidationError as err:
+        messages = _messages(err)
+        raise ValidationError(messages if many else messages.get(0, messages))
+    loaded = [obj.model_dump(exclude_unset=True) for obj in objects]
+    return loaded if many else loaded[0]
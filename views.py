@@ -0,0 +1,185 @@
+from typing import Union
+
+from bson import ObjectId
+from pymongo import ReturnDocument
+from pymongo.errors import DocumentTooLarge, WriteError
+
+import db
+import utils
+from config import Config
+
+# Collection holding one fully resolved document per world
+VIEWS = "WorldViews"
+# Server error codes of a write whose document would be over the BSON size limit
+TOO_LARGE_CODES = {10334, 17419}
+
+
+def _references(world: dict) -> list:
+    """Every ObjectId a world document references."""
+    refs = set()
+    for field, value in world.items():
+        if utils.reference_collection(field) is None:
+            continue
+        for ref in (value if isinstance(value, list) else [value]):
+            obj_id = utils._as_object_id(ref)
+            if obj_id is not None:
+                refs.add(obj_id)
+    return list(refs)
+
+def _raw(world: dict) -> dict:
+    return {field: value for field, value in world.items() if field not in utils.BOOKKEEPING_FIELDS}
+
+def build_view(world: dict) -> dict:
+    """
+    The view of a world document.
+
+    ``world`` is the world with its references resolved, as `utils.world_data` returns it, and
+    ``_world`` the world document itself, from which the resolved objects are placed.
+    ``_refs`` lists every referenced id and is indexed, so the views embedding an object are
+    found without scanning (see `schemas.indexes.VIEW_INDEXES`).
+    """
+    raw = _raw(world)
+    return {
+        "_id": world["_id"],
+        "WorldName": world["WorldName"],
+        utils.VERSION_FIELD: world.get(utils.VERSION_FIELD, 0),
+        "_refs": _references(raw),
+        "_world": raw,
+        "world": utils.resolve_references(raw),
+    }
+
+def _too_large(err: Exception) -> bool:
+    return isinstance(err, DocumentTooLarge) or (isinstance(err, WriteError) and err.code in TOO_LARGE_CODES)
+
+def rebuild_view(world_name: str) -> Union[dict, None]:
+    """
+    Build the view of a world from scratch and store it. Returns the resolved world, or None if it does not exist.
+
+    A world whose view would be over the BSON size limit is not materialized: any old view is
+    dropped and the resolved world is still returned, so reads of it work as without views.
+    """
+    world = db.collections["Worlds"].find_one({"WorldName": world_name})
+    if world is None:
+        db.collections[VIEWS].delete_one({"WorldName": world_name})
+        return None
+    view = build_view(world)
+    try:
+        db.collections[VIEWS].replace_one({"_id": view["_id"]}, view, upsert=True)
+    except (DocumentTooLarge, WriteError) as err:
+        if not _too_large(err):
+            raise
+        db.collections[VIEWS].delete_one({"_id": view["_id"]})
+    return view["world"]
+
+def rebuild_views() -> int:
+    """Rebuild the view of every world and drop the views of deleted worlds. Returns the number of views."""
+    names = utils.world_names.get()
+    for world_name in names:
+        rebuild_view(world_name)
+    db.collections[VIEWS].delete_many({"WorldName": {"$nin": list(names)}})
+    return len(names)
+
+#region Incremental maintenance
+
+def _current_version(world_id: ObjectId) -> int:
+    world = db.collections["Worlds"].find_one({"_id": world_id}, {utils.VERSION_FIELD: 1})
+    return world.get(utils.VERSION_FIELD, 0) if world is not None else 0
+
+def _bump_version(world_id: ObjectId, fields: list) -> int:
+    world = db.collections["Worlds"].find_one_and_update({"_id": world_id}, utils.version_bump(fields), {utils.VERSION_FIELD: 1},
+                                                         return_document=ReturnDocument.AFTER)
+    return world.get(utils.VERSION_FIELD, 0) if world is not None else 0
+
+def refresh_entities(collection_name: str, ids: list, world_id: Union[ObjectId, None]=None):
+    """
+    Replace the copies of written objects embedded in the views referencing them.
+
+    The views are found through the ``_refs`` index and the objects are read once; only the
+    fields referencing the collection are rewritten, nothing is resolved again. Every world
+    whose view changes has its version bumped, so its cached reads and ETags move on, except
+    ``world_id``, the world the writer bumps itself.
+    """
+    fields = utils.referencing_fields(collection_name)
+    affected = list(db.collections[VIEWS].find({"_refs": {"$in": ids}},
+                                               {**{f"_world.{field}": 1 for field in fields}, **{f"world.{field}": 1 for field in fields}}))
+    if not affected:
+        return
+    objects = {obj["_id"]: obj for obj in db.collections[collection_name].find({"_id": {"$in": ids}})}
+    for view in affected:
+        updates = {}
+        for field in fields:
+            refs = view.get("_world", {}).get(field)
+            current = view.get("world", {}).get(field)
+            if refs is None:
+                continue
+            if isinstance(refs, list):
+                resolved = list(current) if isinstance(current, list) and len(current) == len(refs) else [""] * len(refs)
+                for position, ref in enumerate(refs):
+                    obj_id = utils._as_object_id(ref)
+                    if obj_id in objects:
+                        resolved[position] = objects[obj_id]
+            else:
+                obj_id = utils._as_object_id(refs)
+                resolved = objects[obj_id] if obj_id in objects else current
+            if resolved != current:
+                updates[f"world.{field}"] = resolved
+        if not updates and view["_id"] != world_id:
+            continue
+        if view["_id"] == world_id:
+            updates[utils.VERSION_FIELD] = _current_version(view["_id"])
+        else:
+            updates[utils.VERSION_FIELD] = _bump_version(view["_id"], fields)
+        _update_view(view["_id"], updates)
+
+def refresh_world(world_id: ObjectId, fields: Union[list, None]):
+    """Rewrite the fields of a view whose world document changed, or drop the view of a deleted world."""
+    world = db.collections["Worlds"].find_one({"_id": world_id}) if fields is not None else None
+    if world is None:
+        db.collections[VIEWS].delete_one({"_id": world_id})
+        return
+    if db.collections[VIEWS].count_documents({"_id": world_id}, limit=1) == 0:
+        # Views are created on first read, see `read_view`
+        return
+    raw = _raw(world)
+    changed = {field: raw[field] for field in fields if field in raw}
+    updates = {f"world.{field}": value for field, value in utils.resolve_references(changed).items()}
+    updates.update({
+        "WorldName": world["WorldName"],
+        utils.VERSION_FIELD: world.get(utils.VERSION_FIELD, 0),
+        "_refs": _references(raw),
+        "_world": raw,
+    })
+    _update_view(world_id, updates)
+
+def _update_view(world_id: ObjectId, updates: dict):
+    """Apply updates to a view, dropping it instead if it would grow over the BSON size limit."""
+    try:
+        db.collections[VIEWS].update_one({"_id": world_id}, {"$set": updates})
+    except (DocumentTooLarge, WriteError) as err:
+        if not _too_large(err):
+            raise
+        db.collections[VIEWS].delete_one({"_id": world_id})
+
+def read_view(world_name: str, version: int) -> Union[dict, None]:
+    """
+    The resolved world from its view, with one ``find_one``.
+
+    A view that is missing, or behind the world's version because it was written without going
+    through `utils` (e.g. `utils.bump_world_version` alone), is rebuilt first.
+    """
+    view = db.collections[VIEWS].find_one({"WorldName": world_name}, {"world": 1, utils.VERSION_FIELD: 1})
+    if view is None or view.get(utils.VERSION_FIELD) != version:
+        return rebuild_view(world_name)
+    return view["world"]
+
+#endregion Incremental maintenance
+
+def register():
+    """Serve full world reads from the views and keep them up to date with every write."""
+    if read_view not in utils.world_readers:
+        utils.world_readers.append(read_view)
+        utils.entity_listeners.append(refresh_entities)
+        utils.world_listeners.append(refresh_world)
+
+if Config.USE_WORLD_VIEWS:
+    register()
@@ -1,8 +1,50 @@
-from apiflask import Blueprint, jsonify
-from utils import load_json, check_existence, abort_if_not_found
+from apiflask import APIBlueprint, abort
+from flask import current_app, jsonify, request
+from bson import ObjectId
+from typing import Union
+from utils import (category_exists, category_objects, iter_category, iter_world, patch_object,
+                   reference_collection, world_data, world_exists)
+from conditional import conditional_world
+from fieldsets import parse_fields, parse_include
+from graph import world_graph
+from reputation import world_reputation
+from timeline import world_timeline
+from search import search_world
+from streaming import STREAM_FORMATS, stream_response
+import db
 import os
+import zlib
 
-world_bp = Blueprint('world', __name__, url_prefix='/api/world')
+world_bp = APIBlueprint('world', __name__, url_prefix='/api/world')
+
+def from_file() -> bool:
+    """Whether a request reads the JSON files (``?source=file``) instead of the database."""
+    return request.args.get('source') == 'file'
+
+def requested_stream() -> Union[str, None]:
+    """The ``?stream=`` format of a request, None for a regular response."""
+    stream_format = request.args.get('stream')
+    if stream_format is not None and stream_format not in STREAM_FORMATS:
+        abort(400, f'stream must be one of {", ".join(STREAM_FORMATS)}')
+    return stream_format
+
+def requested_shape() -> tuple:
+    """The parsed ``?fields=`` and ``?include=`` of a request, a 400 if either names an unknown field."""
+    try:
+        return parse_fields(request.args.get('fields')), parse_include(request.args.get('include'))
+    except ValueError as err:
+        abort(400, str(err))
+
+def representation_tag() -> str:
+    """
+    The fields, references and stream format a response is built from, normalized so that
+    equivalent query strings share an ETag and different representations never do.
+    """
+    fields, include = requested_shape()
+    shape = (sorted((top, sorted(paths)) for top, paths in fields.items()) if fields is not None else None,
+             sorted(include) if include is not None else None,
+             requested_stream())
+    return format(zlib.crc32(repr(shape).encode()), 'x')
 
 @world_bp.route('/')
 def index():
@@ -10,10 +52,144 @@ def index():
     return jsonify(world_names)
 
 @world_bp.route('/<string:world_name>')
+@conditional_world('API_CACHE_CONTROL', extra=representation_tag)
 def get_world(world_name):
-    world_path = f'Worlds/{world_name}.json'
-    abort_if_not_found(check_existence(world_path), f'World {world_name} not found')
-    world_data = load_json(world_path)
-    return jsonify(world_data)
+    """
+    The resolved world. ``?fields=`` (e.g. ``geography,pantheon.gods.name``) limits what is
+    read and returned, ``?include=`` which references are resolved.
+    """
+    fields, include = requested_shape()
+    stream_format = requested_stream()
+    if not world_exists(world_name, from_file()):
+        abort(404, f'World {world_name} not found')
+    if stream_format is not None:
+        return stream_response(iter_world(world_name, from_file(), fields, include), stream_format, key_name='field')
+    return jsonify(world_data(world_name, from_file(), fields, include))
+
+@world_bp.route('/<string:world_name>/<string:category>')
+@conditional_world('API_CACHE_CONTROL', extra=lambda: requested_stream() or 'json')
+def get_category(world_name, category):
+    """One category of a world, streamed with ``?stream=ndjson`` or ``?stream=json``."""
+    stream_format = requested_stream()
+    if not world_exists(world_name, from_file()) or not category_exists(world_name, category, from_file()):
+        abort(404, f'{category} not found in world {world_name}')
+    if stream_format is not None:
+        return stream_response(iter_category(world_name, category, from_file()), stream_format)
+    return jsonify(category_objects(world_name, category, from_file()))
+
+@world_bp.patch('/<string:world_name>/<string:category>/<string:obj_id>')
+def patch_world_object(world_name, category, obj_id):
+    """Apply a sparse patch to one object of a world, see `utils.compile_patch`."""
+    collection_name = reference_collection(category)
+    if collection_name is None or not ObjectId.is_valid(obj_id):
+        abort(404, f'{category} {obj_id} not found in world {world_name}')
+    # The object must be one the world references, whether stored as an ObjectId or a string
+    owner = db.collections["Worlds"].find_one({"WorldName": world_name, category: {"$in": [ObjectId(obj_id), obj_id]}}, {"_id": 1})
+    if owner is None:
+        abort(404, f'{category} {obj_id} not found in world {world_name}')
+    try:
+        result = patch_object(db.collections[collection_name], obj_id, request.get_json(), world_id=world_name)
+    except ValueError as err:
+        abort(400, str(err))
+    if result.matched_count == 0:
+        abort(404, f'{category} {obj_id} not found in world {world_name}')
+    return {"matched": result.matched_count, "modified": result.modified_count}
+
+def graph_or_404(world_name):
+    graph = world_graph(world_name, from_file())
+    if graph is None:
+        abort(404, f'World {world_name} not found')
+    return graph
+
+@world_bp.route('/<string:world_name>/relationships/<string:entity>')
+def entity_relationships(world_name, entity):
+    """Every relationship an entity holds or is the subject of."""
+    graph = graph_or_404(world_name)
+    return jsonify({"entity": entity, "outgoing": graph.outgoing(entity), "incoming": graph.incoming(entity)})
+
+@world_bp.route('/<string:world_name>/hostility')
+def mutual_hostility(world_name):
+    """Pairs of entities hostile to each other, optionally only those involving ``?entity=``."""
+    graph = graph_or_404(world_name)
+    threshold = request.args.get('threshold', current_app.config['HOSTILITY_THRESHOLD'], type=int)
+    return jsonify(graph.mutual_hostility(threshold, request.args.get('entity')))
+
+@world_bp.route('/<string:world_name>/alliances')
+def alliance_chain(world_name):
+    """Shortest chain of alliances from ``?from=`` to ``?to=``."""
+    graph = graph_or_404(world_name)
+    source, target = request.args.get('from'), request.args.get('to')
+    if not source or not target:
+        abort(400, 'Both from and to are required')
+    threshold = request.args.get('threshold', current_app.config['ALLIANCE_THRESHOLD'], type=int)
+    chain = graph.alliance_chain(source, target, threshold)
+    if chain is None:
+        abort(404, f'No chain of alliances from {source} to {target}')
+    return jsonify({"from": source, "to": target, "chain": chain})
+
+def reputation_or_404(world_name):
+    matrix = world_reputation(world_name, from_file())
+    if matrix is None:
+        abort(404, f'World {world_name} not found')
+    return matrix
+
+@world_bp.route('/<string:world_name>/reputation/standing')
+def reputation_standing(world_name):
+    """Average reputation each entity is held in."""
+    return jsonify(reputation_or_404(world_name).standing())
+
+@world_bp.route('/<string:world_name>/reputation/most-hated')
+def most_hated(world_name):
+    """The ``?limit=`` entities with the lowest standing."""
+    return jsonify(reputation_or_404(world_name).most_hated(request.args.get('limit', 1, type=int)))
+
+@world_bp.route('/<string:world_name>/reputation/blocs')
+def reputation_blocs(world_name):
+    """Blocs of entities allied with each other."""
+    threshold = request.args.get('threshold', current_app.config['ALLIANCE_THRESHOLD'], type=int)
+    return jsonify(reputation_or_404(world_name).blocs(threshold))
+
+@world_bp.route('/<string:world_name>/reputation/war')
+def war_sides(world_name):
+    """Who would side with whom if ``?between=`` and ``?and=`` went to war."""
+    first, second = request.args.get('between'), request.args.get('and')
+    if not first or not second:
+        abort(400, 'Both between and and are required')
+    try:
+        return jsonify(reputation_or_404(world_name).sides(first, second))
+    except KeyError as err:
+        abort(404, f'{err.args[0]} has no relationships in world {world_name}')
+
+def timeline_or_404(world_name):
+    timeline = world_timeline(world_name, from_file())
+    if timeline is None:
+        abort(404, f'World {world_name} not found')
+    return timeline
+
+@world_bp.route('/<string:world_name>/history/at/<int(signed=True):year>')
+def history_at(world_name, year):
+    """What was happening in ``year``, optionally only from the perspective of ``?faction=``."""
+    return jsonify(timeline_or_404(world_name).at(year, request.args.get('faction')))
+
+@world_bp.route('/<string:world_name>/history/range')
+def history_range(world_name):
+    """Every period overlapping ``?start=`` to ``?end=``."""
+    start, end = request.args.get('start', type=int), request.args.get('end', type=int)
+    if start is None or end is None:
+        abort(400, 'Both start and end are required')
+    return jsonify(timeline_or_404(world_name).between(start, end, request.args.get('faction')))
+
+@world_bp.route('/<string:world_name>/search')
+def search(world_name):
+    """Entities matching ``?q=``, best first, paged with ``?page=`` and ``?per_page=``."""
+    query = request.args.get('q', '')
+    if not query.strip():
+        abort(400, 'q is required')
+    page = max(request.args.get('page', 1, type=int), 1)
+    per_page = min(max(request.args.get('per_page', 20, type=int), 1), 100)
+    results = search_world(world_name, query, page, per_page, from_file())
+    if results is None:
+        abort(404, f'World {world_name} not found')
+    return jsonify(results)
 
 # Additional routes can be added here similarly